@@ -0,0 +1,413 @@
+'''
+Benchmark suite.
+Times maze generation, loop injection, the solvers, CSV save and load and
+headless drawing over maze sizes and loop_percent values, with the peak
+memory (tracemalloc) and the nodes the searches expanded. Results can be
+stored as a baseline and later runs compared against it: a run fails
+(exit code 1) when a case is slower or uses more memory than the baseline
+by more than the tolerance, or expands a different number of nodes.
+
+    python benchmarks/bench.py                      run and compare
+    python benchmarks/bench.py --save               store a new baseline
+    python benchmarks/bench.py --sizes 10 100 --loops 0
+    python benchmarks/bench.py --suite scaling      up to 4000x4000
+
+Mazes are generated with a fixed seed, so nodes expanded are exact.
+Times depend on the machine and on what else it is running, so
+benchmarks/baseline.json is only a local reference, from one machine, and
+not a gate for other machines or CI: make a baseline with --save on the
+machine that runs the comparison, while it is otherwise idle. A case is
+timed as the median of --repeat runs, and TIME_SLACK is allowed on top of
+the tolerance, so one slow run of a short case doesn't fail the
+comparison. The 2000x2000 cases take most of the time of a full run
+(about half an hour on one core), --sizes picks fewer.
+
+The other suites only report, and check themselves instead of a baseline:
+    scaling     generation and a_star time per cell from 250x250 up to
+                4000x4000, fails if it grows more than SCALING_LIMIT times
+    walls       line items of the drawing: the merged wall_runs against one
+                line per closed side of every cell (the drawing before
+                runs), counts and time to work out the coordinates, fails
+                if the runs are not fewer lines
+    gif         the frames of export_gif for Agents whose paths cross,
+                fails if the last frame differs from render() of the paths
+    batch       solve_many throughput (pairs per second) with 1 worker
+                process up to one per core, fails if a result differs from
+                a_star in this process
+'''
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src import solvers  # noqa: E402
+from src.agent import Agent  # noqa: E402
+from src.batch import solve_many  # noqa: E402
+from src.csvio import read_maze_csv, write_maze_csv  # noqa: E402
+from src.gif import gif_frames  # noqa: E402
+from src.loops import add_loops  # noqa: E402
+from src.model import MazeModel  # noqa: E402
+from src.walls import EAST, WEST, NORTH, SOUTH, wall_runs  # noqa: E402
+from src.raster import Raster, render  # noqa: E402
+from src.theme import COLOR  # noqa: E402
+
+SIZES = (10, 100, 500, 1000, 2000)
+SCALING_SIZES = (250, 500, 1000, 2000, 4000)
+# allowed growth of the time per cell from the smallest to the largest size
+SCALING_LIMIT = 3
+LOOPS = (0, 10, 50)
+SEED = 1
+WALL_SIZES = (10, 100, 500, 1000)
+GIF_SIZE = 30
+# maze side and number of (start, goal) pairs of the batch suite
+BATCH_SIZE = 500
+BATCH_PAIRS = 200
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+# largest side of the rendered image, in pixels
+RENDER_PIXELS = 2000
+# allowed on top of the tolerance, timer and allocator noise of small cases
+TIME_SLACK = 0.025
+PEAK_SLACK = 64*1024
+
+
+def _maze(size, loop_percent):
+    m = MazeModel(size, size)
+    m.create_maze(1, 1, loop_percent=loop_percent, seed=SEED)
+    return m
+
+
+def _cases(size, loop_percent, tmp):
+    '''
+    (name, setup, run) of every benchmark of a size and loop_percent.
+    setup() makes the input outside of the measurement, run(input)
+    returns the nodes expanded or None.
+    '''
+    csv_file = os.path.join(tmp, f'{size}-{loop_percent}.csv')
+
+    def generate(_):
+        _maze(size, loop_percent)
+
+    def loops_setup():
+        m = _maze(size, 0)
+        parent = m._parents()
+        cells = [size*size-1]
+        while cells[-1] != 0:
+            cells.append(parent[cells[-1]])
+        return m._walls.copy(), cells
+
+    def loops(arg):
+        walls, cells = arg
+        add_loops(walls, cells, loop_percent, rng=random.Random(SEED))
+
+    def a_star(m):
+        stats = {}
+        solvers.a_star(m, stats=stats)
+        return stats['nodes_expanded']
+
+    def bfs(m):
+        # the search of MazeModel.path
+        stats = {}
+        m._breadth_first_search((size, size), stats)
+        return stats['nodes_expanded']
+
+    def csv_save(m):
+        write_maze_csv(csv_file, m._walls)
+
+    def csv_load(_):
+        read_maze_csv(csv_file)
+
+    def draw(m):
+        render(m, cell_width=min(20, RENDER_PIXELS/size))
+
+    built = []
+
+    def maze():
+        # the cases only read it, it is generated once
+        if not built:
+            built.append(_maze(size, loop_percent))
+        return built[0]
+    cases = [('generate', lambda: None, generate)]
+    if loop_percent:
+        cases.append(('loops', loops_setup, loops))
+    cases += [('a_star', maze, a_star), ('bfs', maze, bfs),
+              ('csv_save', maze, csv_save), ('csv_load', lambda: None, csv_load),
+              ('draw', maze, draw)]
+    return cases
+
+
+def measure(setup, run, repeat):
+    '''
+    Median time of repeat runs, then the peak memory of one more run under
+    tracemalloc (it slows the run down, so it isn't timed).
+    '''
+    times = []
+    nodes = None
+    for _ in range(repeat):
+        arg = setup()
+        t = time.perf_counter()
+        nodes = run(arg)
+        times.append(time.perf_counter()-t)
+    arg = setup()
+    tracemalloc.start()
+    run(arg)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {'time': statistics.median(times), 'peak': peak, 'nodes': nodes}
+
+
+def run_suite(sizes=SIZES, loops=LOOPS, repeat=5, out=print):
+    '''
+    Runs every case, returns {'name/size/loop_percent': result}.
+    '''
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in sizes:
+            for loop_percent in loops:
+                for name, setup, run in _cases(size, loop_percent, tmp):
+                    key = f'{name}/{size}/{loop_percent}'
+                    # one run is enough for the big mazes
+                    r = measure(setup, run, repeat if size <= 500 else 1)
+                    results[key] = r
+                    out(f'{key:<22} {r["time"]*1000:>10.1f} ms {r["peak"]/2**20:>9.1f} MiB'
+                        + (f' {r["nodes"]:>10} nodes' if r['nodes'] is not None else ''))
+    return results
+
+
+def run_scaling(sizes=SCALING_SIZES, out=print):
+    '''
+    Times create_maze (backtracker, no loops) and a_star from the bottom
+    right cell at every size. With near-linear growth the time per cell
+    stays about the same. Returns {size: result} and the failures, the
+    kinds whose time per cell grew more than SCALING_LIMIT times.
+    '''
+    results = {}
+    for size in sizes:
+        n = size*size
+        m = MazeModel(size, size)
+        t = time.perf_counter()
+        m.create_maze(1, 1, seed=SEED)
+        generate = time.perf_counter()-t
+        stats = {}
+        t = time.perf_counter()
+        solvers.a_star(m, stats=stats)
+        solve = time.perf_counter()-t
+        del m
+        results[size] = {'generate': generate, 'a_star': solve,
+                         'nodes': stats['nodes_expanded']}
+        out(f'{size:>5}x{size:<5} generate {generate:>8.2f} s {generate/n*1e9:>6.0f} ns/cell'
+            f'   a_star {solve:>8.2f} s {solve/n*1e9:>6.0f} ns/cell {stats["nodes_expanded"]:>10} nodes')
+    failures = []
+    if len(sizes) > 1:
+        first, last = sizes[0], sizes[-1]
+        for kind in ('generate', 'a_star'):
+            growth = (results[last][kind]/last**2) / (results[first][kind]/first**2)
+            out(f'{kind}: time per cell x{growth:.2f} from {first}x{first} to {last}x{last}')
+            if growth > SCALING_LIMIT:
+                failures.append(f'{kind}: time per cell grew x{growth:.2f}')
+    return results, failures
+
+
+def _cell_lines(walls, w):
+    '''
+    Coordinates of one line per closed side of every cell, the way
+    Maze._draw made them before the walls were merged into runs.
+    '''
+    lines = []
+    rows, cols = walls.shape
+    for x in range(1, rows+1):
+        for y in range(1, cols+1):
+            bits = walls.item(x-1, y-1)
+            top, left = x*w-w, y*w-w
+            if not bits & EAST:
+                lines.append((left+w, top, left+w, top+w))
+            if not bits & WEST:
+                lines.append((left, top, left, top+w))
+            if not bits & NORTH:
+                lines.append((left, top, left+w, top))
+            if not bits & SOUTH:
+                lines.append((left, top+w, left+w, top+w))
+    return lines
+
+
+def _run_lines(walls, w):
+    '''
+    Coordinates of the lines Maze._draw makes from wall_runs.
+    '''
+    horizontal, vertical = wall_runs(walls)
+    lines = [(c0*w, r*w, c1*w, r*w) for r, c0, c1 in horizontal]
+    lines += [(c*w, r0*w, c*w, r1*w) for c, r0, r1 in vertical]
+    return lines
+
+
+def run_walls(sizes=WALL_SIZES, loops=LOOPS, out=print):
+    '''
+    Line items and the time to work out their coordinates, one line per
+    closed cell side against the merged runs, for every size and
+    loop_percent. Returns {'size/loop_percent': result} and the failures.
+    '''
+    results = {}
+    failures = []
+    for size in sizes:
+        for loop_percent in loops:
+            walls = _maze(size, loop_percent)._walls
+            r = {}
+            for kind, lines in (('cells', _cell_lines), ('runs', _run_lines)):
+                t = time.perf_counter()
+                r[kind] = len(lines(walls, 10))
+                r[kind+'_time'] = time.perf_counter()-t
+            key = f'{size}/{loop_percent}'
+            results[key] = r
+            out(f'{key:<10} cells {r["cells"]:>9} lines {r["cells_time"]*1000:>9.1f} ms'
+                f'   runs {r["runs"]:>9} lines {r["runs_time"]*1000:>9.1f} ms'
+                f'   lines x{r["runs"]/r["cells"]:.2f}, time x{r["runs_time"]/r["cells_time"]:.2f}')
+            if r['runs'] >= r['cells']:
+                failures.append(f'walls/{key}: {r["runs"]} runs, {r["cells"]} cell lines')
+    return results, failures
+
+
+def run_gif(size=GIF_SIZE, out=print):
+    '''
+    Plays the GIF frames (src/gif.py) of Agents whose paths cross onto one
+    image, with every mix of arrow, footprints and none, and compares the
+    last frame with render() of the same paths. Returns the failures.
+    '''
+    failures = []
+    kinds = (({'footprints': True}, {}),
+             ({'shape': 'arrow', 'footprints': True}, {'filled': True, 'footprints': True}),
+             ({}, {'shape': 'arrow'}),
+             ({'filled': True, 'footprints': True}, {'shape': 'arrow', 'footprints': True}))
+    for one, two in kinds:
+        m = _maze(size, 30)
+        a = Agent(m, size, size, color=COLOR.red, **one)
+        b = Agent(m, size, 1, goal=(1, size), color=COLOR.blue, **two)
+        paths = {a: solvers.a_star(m), b: solvers.a_star(m, (size, 1), (1, size))}
+        shared = len(set(paths[a]) & set(paths[b]))
+        r = Raster(m)
+        t = time.perf_counter()
+        image = None
+        count = 0
+        for frame, left, top in gif_frames(r, m, paths):
+            if image is None:
+                image = frame.copy()
+            else:
+                image[top:top+frame.shape[0], left:left+frame.shape[1]] = frame
+            count += 1
+        seconds = time.perf_counter()-t
+        last = np.asarray(r.palette, dtype=np.uint8)[image]
+        differ = (last != render(m, paths).rgb()).any(axis=2).mean()
+        out(f'{one} / {two}: {shared} shared cells, {count} frames in {seconds*1000:.1f} ms,'
+            f' {differ:.2%} pixels differ from render')
+        if differ:
+            failures.append(f'gif: {one} / {two}, last frame differs from render in {differ:.2%} of the pixels')
+    return failures
+
+
+def run_batch(size=BATCH_SIZE, pairs=BATCH_PAIRS, out=print):
+    '''
+    Solves the same random (start, goal) pairs on a size x size Maze (10%
+    loops) with solve_many, with 1 up to os.cpu_count() worker processes.
+    Returns {processes: pairs per second} and the failures.
+    '''
+    m = _maze(size, 10)
+    rng = random.Random(SEED)
+    cells = [((rng.randint(1, size), rng.randint(1, size)),
+              (rng.randint(1, size), rng.randint(1, size))) for _ in range(pairs)]
+    expected = {(s, g): solvers.a_star(m, s, g) for s, g in cells}
+    cores = os.cpu_count() or 1
+    out(f'{size}x{size}, {pairs} pairs, {cores} cores')
+    results = {}
+    failures = []
+    for processes in range(1, cores+1):
+        t = time.perf_counter()
+        solved = list(solve_many(m, cells, processes=processes))
+        seconds = time.perf_counter()-t
+        results[processes] = pairs/seconds
+        out(f'{processes:>3} processes {seconds:>8.2f} s {pairs/seconds:>9.1f} pairs/s'
+            f'   x{results[processes]/results[1]:.2f}')
+        if any(path != expected[s, g] for s, g, path in solved):
+            failures.append(f'batch: {processes} processes, a path differs from a_star')
+    return results, failures
+
+
+def compare(results, baseline, tolerance):
+    '''
+    The regressions of results against baseline, as messages.
+    Cases missing on either side are skipped. TIME_SLACK and PEAK_SLACK
+    are allowed on top of the tolerance, so that the noise of the small
+    cases doesn't fail the run.
+    '''
+    failures = []
+    for key, r in results.items():
+        b = baseline.get(key)
+        if b is None:
+            continue
+        if r['time'] > b['time']*(1+tolerance) + TIME_SLACK:
+            failures.append(f'{key}: {r["time"]*1000:.1f} ms, baseline {b["time"]*1000:.1f} ms')
+        if r['peak'] > b['peak']*(1+tolerance) + PEAK_SLACK:
+            failures.append(f'{key}: peak {r["peak"]} bytes, baseline {b["peak"]}')
+        if r['nodes'] != b['nodes']:
+            failures.append(f'{key}: {r["nodes"]} nodes expanded, baseline {b["nodes"]}')
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='PyMaze benchmark suite')
+    parser.add_argument('--suite', default='cases', choices=('cases', 'scaling', 'walls', 'gif', 'batch'))
+    parser.add_argument('--sizes', type=int, nargs='+',
+                        help=f'default {SIZES}, {SCALING_SIZES} for scaling, {WALL_SIZES} for walls')
+    parser.add_argument('--loops', type=int, nargs='+', default=LOOPS,
+                        help='loop_percent values')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='runs timed per case (the median is kept), 1 above 500x500')
+    parser.add_argument('--baseline', default=BASELINE)
+    parser.add_argument('--tolerance', type=float, default=0.5,
+                        help='allowed slowdown or memory growth, 0.5 is 50%%')
+    parser.add_argument('--save', action='store_true',
+                        help='store the results as the baseline instead of comparing')
+    args = parser.parse_args(argv)
+
+    if args.suite == 'scaling':
+        failures = run_scaling(args.sizes or SCALING_SIZES)[1]
+        return _report(failures)
+    if args.suite == 'walls':
+        return _report(run_walls(args.sizes or WALL_SIZES, args.loops)[1])
+    if args.suite == 'gif':
+        return _report(run_gif())
+    if args.suite == 'batch':
+        return _report(run_batch()[1])
+    results = run_suite(args.sizes or SIZES, args.loops, args.repeat)
+    if args.save:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        baseline.update(results)
+        with open(args.baseline, 'w') as f:
+            json.dump(baseline, f, indent=1, sort_keys=True)
+        print(f'baseline saved to {args.baseline}')
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f'no baseline at {args.baseline}, run with --save first')
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    return _report(compare(results, baseline, args.tolerance))
+
+
+def _report(failures):
+    for msg in failures:
+        print('REGRESSION', msg)
+    print(f'{len(failures)} regressions')
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
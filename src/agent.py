@@ -1,5 +1,8 @@
-from tkinter import *
+import logging
 from src.theme import COLOR
+from src.walls import EAST, WEST, NORTH, SOUTH
+
+logger = logging.getLogger(__name__)
 
 
 class Agent:
@@ -30,7 +33,8 @@ class Agent:
         _head-->    You don't need to pass this
                     It is actually the Agent.
         _body-->    You don't need to pass this
-                    Tracks the body of the Agent (the previous positions of it)
+                    The footprints of the Agent: one line (_trail) through the
+                    cells it has been to, grown with canvas insert on every move
         '''
         self._parent_maze = parent_maze
         self.color = color
@@ -42,20 +46,20 @@ class Agent:
         self.filled = filled
         self.shape = shape
         self._orient = 0
+        self.footprints = footprints
+        self._body = []
         if x is None:
             x = parent_maze.rows
         if y is None:
             y = parent_maze.cols
         self.x = x
         self.y = y
-        self.footprints = footprints
         self._parent_maze._agents.append(self)
         if goal == None:
             self.goal = self._parent_maze._goal
         else:
             self.goal = goal
-        print("this is goal cor: ", self.goal)
-        self._body = []
+        logger.debug("this is goal cor: %s", self.goal)
         self.position = (self.x, self.y)
 
     @property
@@ -73,6 +77,10 @@ class Agent:
     @y.setter
     def y(self, new_y):
         self._y = new_y
+        canvas = self._parent_maze._canvas
+        if canvas is None:
+            # Maze isn't drawn (yet), only the position is tracked
+            return
         w = self._parent_maze._cell_width
         x = self.x*w-w+self._parent_maze._lab_width
         y = self.y*w-w+self._parent_maze._lab_width
@@ -83,79 +91,84 @@ class Agent:
                 self._coord = (y + w/2.5, x + w/2.5, y +
                                w/2.5 + w/4, x + w/2.5 + w/4)
         else:
-            self._coord = (y + w/2, x + 3*w/9, y + w/2, x + 3*w/9+w/4)
-
-        if (hasattr(self, '_head')):
-            if self.footprints is False:
-                self._parent_maze._canvas.delete(self._head)
-            else:
-                if self.shape == 'square':
-                    self._parent_maze._canvas.itemconfig(
-                        self._head, fill=self.color.value[1], outline="")
-                    self._parent_maze._canvas.tag_raise(self._head)
-                    try:
-                        self._parent_maze._canvas.tag_lower(self._head, 'ov')
-                    except:
-                        pass
-                    if self.filled:
-                        lll = self._parent_maze._canvas.coords(self._head)
-                        oldcell = (round(((lll[1]-26)/self._parent_maze._cell_width)+1), round(
-                            ((lll[0]-26)/self._parent_maze._cell_width)+1))
-                        self._parent_maze._redraw_cell(
-                            *oldcell, self._parent_maze.theme)
-                else:
-                    self._parent_maze._canvas.itemconfig(
-                        self._head, fill=self.color.value[1])  # ,outline='gray70')
-                    self._parent_maze._canvas.tag_raise(self._head)
-                    try:
-                        self._parent_maze._canvas.tag_lower(self._head, 'ov')
-                    except:
-                        pass
-                self._body.append(self._head)
-            if not self.filled or self.shape == 'arrow':
-                if self.shape == 'square':
-                    self._head = self._parent_maze._canvas.create_rectangle(
-                        *self._coord, fill=self.color.value[0], outline='')  # stipple='gray75'
-                    try:
-                        self._parent_maze._canvas.tag_lower(self._head, 'ov')
-                    except:
-                        pass
-                else:
-                    self._head = self._parent_maze._canvas.create_line(
-                        *self._coord, fill=self.color.value[0], arrow=FIRST, arrowshape=(3/10*w, 4/10*w, 4/10*w))  # ,outline=self.color.name)
-                    try:
-                        self._parent_maze._canvas.tag_lower(self._head, 'ov')
-                    except:
-                        pass
-                    o = self._orient % 4
-                    if o == 1:
-                        self._rotate_clock_wise()
-                        self._orient -= 1
-                    elif o == 3:
-                        self._rotate_counter_clock_wise()
-                        self._orient += 1
-                    elif o == 2:
-                        self._rotate_counter_clock_wise()
-                        self._rotate_counter_clock_wise()
-                        self._orient += 2
+            self._coord = self._arrow_coord(x, y, w)
+        if not hasattr(self, '_head'):
+            self._create_items()
+            return
+        # the same items are moved, nothing is created or raised
+        canvas.coords(self._head, *self._coord)
+        centre = self._centre()
+        if self.footprints and centre != self._last:
+            if self._steps == 0:
+                canvas.coords(self._trail, *self._last, *centre)
+                canvas.itemconfigure(self._trail, state='normal')
             else:
-                self._head = self._parent_maze._canvas.create_rectangle(
-                    *self._coord, fill=self.color.value[0], outline='')  # stipple='gray75'
-                try:
-                    self._parent_maze._canvas.tag_lower(self._head, 'ov')
-                except:
-                    pass
-                self._parent_maze._redraw_cell(
-                    self.x, self.y, theme=self._parent_maze.theme)
+                canvas.insert(self._trail, 'end', centre)
+            self._steps += 1
+        self._last = centre
+
+    def _arrow_coord(self, x, y, w):
+        '''
+        Coordinates of the arrow in the cell at x,y (pixels), pointing in
+        the direction of _orient.
+        '''
+        cx, cy = y + w/2, x + w/2
+        points = ((0, 3*w/9 - w/2), (0, 3*w/9 + w/4 - w/2))
+        for _ in range(self._orient % 4):
+            points = tuple((-dy, dx) for dx, dy in points)
+        (x1, y1), (x2, y2) = points
+        return (cx + x1, cy + y1, cx + x2, cy + y2)
+
+    def _centre(self):
+        '''
+        Centre of the Agent on the canvas, the footprints go through it.
+        '''
+        if self.shape == 'square':
+            return ((self._coord[0]+self._coord[2])/2, (self._coord[1]+self._coord[3])/2)
+        w = self._parent_maze._cell_width
+        lab = self._parent_maze._lab_width
+        return (self.y*w-w/2+lab, self.x*w-w/2+lab)
+
+    def _create_items(self):
+        '''
+        Creates the canvas items of the Agent once, when it is first drawn:
+        the head and one line for all its footprints (_trail, hidden until
+        the first move). Both go under the Maze lines (tag 'wall'), so the
+        walls stay on top without being raised on every move.
+        '''
+        canvas = self._parent_maze._canvas
+        w = self._parent_maze._cell_width
+        self._last = self._centre()
+        self._steps = 0
+        self._trail = canvas.create_line(
+            *self._last, *self._last, fill=self.color.value[1], state='hidden',
+            capstyle='projecting', joinstyle='miter')
+        if self.shape == 'square':
+            self._head = canvas.create_rectangle(
+                *self._coord, fill=self.color.value[0], outline='')
         else:
-            self._head = self._parent_maze._canvas.create_rectangle(
-                *self._coord, fill=self.color.value[0], outline='')  # stipple='gray75'
+            self._head = canvas.create_line(
+                *self._coord, fill=self.color.value[0], arrow='first', arrowshape=(3/10*w, 4/10*w, 4/10*w))
+        self._body = [self._trail]
+        self._resize()
+        for item in (self._trail, self._head):
             try:
-                self._parent_maze._canvas.tag_lower(self._head, 'ov')
-            except:
+                canvas.tag_lower(item, 'wall')
+            except Exception:
+                # nothing tagged 'wall' on the canvas
                 pass
-            self._parent_maze._redraw_cell(
-                self.x, self.y, theme=self._parent_maze.theme)
+
+    def _resize(self):
+        '''
+        Applies the cell width to the sizes of the items, after a zoom.
+        '''
+        canvas = self._parent_maze._canvas
+        w = self._parent_maze._cell_width
+        self._coord = tuple(canvas.coords(self._head))
+        self._last = self._centre()
+        canvas.itemconfigure(self._trail, width=w if self.filled and self.shape == 'square' else w/4)
+        if self.shape == 'arrow':
+            canvas.itemconfigure(self._head, arrowshape=(3/10*w, 4/10*w, 4/10*w))
 
     @property
     def position(self):
@@ -171,6 +184,10 @@ class Agent:
         '''
         To Rotate the Agent in Counter Clock Wise direction
         '''
+        if self._parent_maze._canvas is None:
+            self._orient = (self._orient-1) % 4
+            return
+
         def point_new(p, new_origin):
             return (p[0]-new_origin[0], p[1]-new_origin[1])
         w = self._parent_maze._cell_width
@@ -191,6 +208,10 @@ class Agent:
         '''
         To Rotate the Agent in Clock Wise direction
         '''
+        if self._parent_maze._canvas is None:
+            self._orient = (self._orient+1) % 4
+            return
+
         def point_new(p, new_origin):
             return (p[0]-new_origin[0], p[1]-new_origin[1])
         w = self._parent_maze._cell_width
@@ -208,19 +229,19 @@ class Agent:
         self._orient = (self._orient+1) % 4
 
     def move_position_right(self, event):
-        if self._parent_maze.maze_map[self.x, self.y]['E'] == True:
+        if self._parent_maze._walls.item(self.x-1, self.y-1) & EAST:
             self.y = self.y+1
 
     def move_position_left(self, event):
-        if self._parent_maze.maze_map[self.x, self.y]['W'] == True:
+        if self._parent_maze._walls.item(self.x-1, self.y-1) & WEST:
             self.y = self.y-1
 
     def move_position_up(self, event):
-        if self._parent_maze.maze_map[self.x, self.y]['N'] == True:
+        if self._parent_maze._walls.item(self.x-1, self.y-1) & NORTH:
             self.x = self.x-1
             self.y = self.y
 
     def move_position_down(self, event):
-        if self._parent_maze.maze_map[self.x, self.y]['S'] == True:
+        if self._parent_maze._walls.item(self.x-1, self.y-1) & SOUTH:
             self.x = self.x+1
             self.y = self.y
\ No newline at end of file
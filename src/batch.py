@@ -0,0 +1,85 @@
+'''
+Batch solving.
+Solves many (start, goal) pairs on one Maze with a pool of processes.
+The wall bits are copied once into a shared memory block that every worker
+attaches to, so a task only sends its two cells, never the Maze itself.
+Every worker builds its view of the Maze once, when it starts, and the
+solvers read the wall bits straight from the shared block, so a task
+costs only its search. Results come back in the order they finish.
+'''
+from multiprocessing import Pool
+from multiprocessing.shared_memory import SharedMemory
+import numpy as np
+from src.solvers import SOLVERS
+
+# set in every worker by _attach
+_shared = None
+
+
+class _SharedMaze:
+    '''
+    The parts of a Maze the solvers use, with the walls in shared memory.
+    _wall_bytes is a flat view of the same block, which the solvers read
+    instead of a copy of _walls (see solvers._wall_bytes).
+    '''
+
+    def __init__(self, shm, rows, cols, goal):
+        self._shm = shm
+        self.rows = rows
+        self.cols = cols
+        self._goal = goal
+        self._walls_version = 0
+        self._walls = np.ndarray((rows, cols), dtype=np.uint8, buffer=shm.buf)
+        self._wall_bytes = shm.buf[:rows*cols]
+
+
+def _attach(name, rows, cols, goal, solver):
+    global _shared
+    shm = SharedMemory(name=name)
+    _shared = (_SharedMaze(shm, rows, cols, goal), solver)
+
+
+def _solve(pair):
+    maze, solver = _shared
+    start, goal = pair
+    return start, goal, solver(maze, start, goal)
+
+
+def solve_many(maze, pairs, solver='a_star', processes=None, chunksize=16):
+    '''
+    Solves every (start, goal) pair on the Maze in a pool of processes.
+
+    args:
+        maze: the Maze (or MazeModel) to solve
+        pairs: iterable of (start, goal) cells, goal None for the goal of
+            the Maze
+        solver: name of a solver in SOLVERS, or a solver function defined at
+            module level (it has to be picklable)
+        processes: number of worker processes, default is the CPU count
+        chunksize: number of pairs sent to a worker at a time, larger is
+            less overhead, smaller gives results back sooner
+
+    returns: generator of (start, goal, forward path dictionary), in the
+    order the pairs finish. The shared memory is freed when the generator
+    is exhausted or closed.
+
+    A bad solver name raises ValueError here, not on the first result.
+    '''
+    if isinstance(solver, str):
+        if solver not in SOLVERS:
+            raise ValueError(f'{solver} is not a valid solver!')
+        solver = SOLVERS[solver]
+    return _solve_many(maze, pairs, solver, processes, chunksize)
+
+
+def _solve_many(maze, pairs, solver, processes, chunksize):
+    rows, cols = maze.rows, maze.cols
+    shm = SharedMemory(create=True, size=rows*cols)
+    try:
+        np.ndarray((rows, cols), dtype=np.uint8, buffer=shm.buf)[:] = maze._walls
+        with Pool(processes, _attach,
+                  (shm.name, rows, cols, maze._goal, solver)) as pool:
+            yield from pool.imap_unordered(_solve, pairs, chunksize)
+    finally:
+        shm.close()
+        shm.unlink()
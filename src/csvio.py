@@ -0,0 +1,80 @@
+'''
+CSV maze files.
+The interchange format save_maze has always written: a header row, then
+one row per cell in grid order (column by column) with the cell and its
+E, W, N, S walls as 0 or 1, and no newline after the last row.
+Reading and writing make a single pass over the file. Files ending in .gz
+are gzip compressed. The header written here also carries the size of the
+Maze; older files without it are still read.
+'''
+import gzip
+import numpy as np
+from src.walls import EAST, WEST, NORTH, SOUTH
+
+HEADER = ['  cell  ', 'E', 'W', 'N', 'S']
+
+
+def _open(filename, mode):
+    if str(filename).endswith('.gz'):
+        return gzip.open(filename, mode+'t', compresslevel=6, newline='')
+    return open(filename, mode, newline='')
+
+
+def write_maze_csv(filename, walls):
+    '''
+    Writes the (rows, cols) wall array to a CSV maze file, gzip compressed
+    if filename ends in .gz.
+    '''
+    rows, cols = walls.shape
+    with _open(filename, 'w') as f:
+        f.write(','.join(HEADER + [f'rows={rows}', f'cols={cols}']))
+        # grid order is column by column, one column in memory at a time
+        for y in range(1, cols+1):
+            f.write(''.join([
+                f'\r\n"({x}, {y})",{b & EAST},{b >> 1 & 1},{b >> 2 & 1},{b >> 3 & 1}'
+                for x, b in enumerate(walls[:, y-1].tolist(), 1)]))
+    return filename
+
+
+def _size(header):
+    '''
+    (rows, cols) from the header row, None if it doesn't have them.
+    '''
+    size = dict(h.split('=', 1) for h in header[len(HEADER):] if '=' in h)
+    if 'rows' in size and 'cols' in size:
+        return int(size['rows']), int(size['cols'])
+    return None
+
+
+def read_maze_csv(filename):
+    '''
+    Reads a CSV maze file (or .csv.gz) in one pass and returns the
+    (rows, cols) wall array.
+    Files without the size in the header are read in grid order: the
+    number of rows is known at the end of the first column, and the
+    number of columns at the end of the file.
+    '''
+    with _open(filename, 'r') as f:
+        header = f.readline().rstrip('\r\n').split(',')
+        size = _size(header)
+        cells = bytearray()
+        rows = size[0] if size else 0
+        k = 0
+        for line in f:
+            if not line.strip():
+                continue
+            # "(x, y)",E,W,N,S
+            cell, e, w, n, s = line.rsplit(',', 4)
+            x, y = cell.strip('"()').split(',')
+            x, y = int(x), int(y)
+            if not rows and y != 1:
+                rows = k
+            if rows and (x != k % rows + 1 or y != k//rows + 1):
+                raise ValueError(f'{filename} has cell {(x, y)} out of grid order!')
+            cells.append(EAST*(e == '1') | WEST*(w == '1') |
+                         NORTH*(n == '1') | SOUTH*(s[0] == '1'))
+            k += 1
+    rows = rows or k
+    if not k or k % rows or (size and size != (rows, k//rows)):
+        raise ValueError(f'{filename} is not a valid maze CSV file!')
+    return np.frombuffer(cells, dtype=np.uint8).reshape(k//rows, rows).T.copy()
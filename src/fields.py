@@ -0,0 +1,128 @@
+'''
+Distance and flow fields.
+One breadth first search from the goal (or from several goals at once)
+gives the distance of every cell to the nearest goal, and the direction
+to step in from every cell to get closer. Any number of Agents can then
+read their path off the flow field at O(1) per step.
+The search is a NumPy wavefront: every step expands the whole frontier
+with a few array operations.
+'''
+from array import array
+from numbers import Integral
+import numpy as np
+from src.walls import EAST, WEST, NORTH, SOUTH
+
+# frontier size from which a wavefront step is done with array operations
+VECTOR_FRONTIER = 64
+
+
+class FlowField:
+    '''
+    dist--> (rows, cols) int32 array, steps from every cell to the nearest
+            goal, -1 where no goal can be reached
+    flow--> (rows, cols) uint8 array, the direction bit (src/walls.py) to
+            move in from every cell towards the nearest goal, 0 on the goals
+            and on the cells that can't reach one
+    '''
+
+    def __init__(self, maze, goals=None):
+        '''
+        maze-->     the Maze (or MazeModel)
+        goals-->    a goal cell or a list of goal cells, default is the goal
+                    of the Maze
+        '''
+        rows, cols = maze.rows, maze.cols
+        if goals is None:
+            goals = [maze._goal]
+        elif len(goals) == 0:
+            raise ValueError('goals is empty!')
+        elif isinstance(goals[0], Integral):
+            # one (x, y) goal, its coordinates may be numpy integers
+            goals = [goals]
+        self.rows, self.cols = rows, cols
+        n = rows*cols
+        walls = maze._walls.tobytes()
+        wall_array = np.frombuffer(walls, dtype=np.uint8)
+        # numpy views over the same buffers, so the scalar and the vectorized
+        # steps below fill in the same arrays
+        dist_buf = array('i', [-1])*n
+        flow_buf = bytearray(n)
+        dist = np.frombuffer(dist_buf, dtype=np.int32)
+        flow = np.frombuffer(flow_buf, dtype=np.uint8)
+        steps = ((EAST, 1, WEST), (WEST, -1, EAST),
+                 (SOUTH, cols, NORTH), (NORTH, -cols, SOUTH))
+        frontier = sorted({int((x-1)*cols + (y-1)) for x, y in goals})
+        for i in frontier:
+            dist_buf[i] = 0
+        d = 0
+        while len(frontier):
+            d += 1
+            if len(frontier) < VECTOR_FRONTIER:
+                # narrow fronts (corridors of a perfect Maze) are cheaper
+                # cell by cell than through a round of array calls
+                nxt = []
+                for i in frontier:
+                    bits = walls[i]
+                    for wall, step, back in steps:
+                        if bits & wall:
+                            j = i+step
+                            if dist_buf[j] < 0:
+                                dist_buf[j] = d
+                                flow_buf[j] = back
+                                nxt.append(j)
+                frontier = nxt
+                continue
+            frontier = np.asarray(frontier, dtype=np.int64)
+            bits = wall_array[frontier]
+            parts = []
+            for wall, step, back in steps:
+                nxt = frontier[(bits & wall) != 0]+step
+                nxt = nxt[dist[nxt] < 0]
+                dist[nxt] = d
+                flow[nxt] = back
+                parts.append(nxt)
+            frontier = np.concatenate(parts)
+            if frontier.size < VECTOR_FRONTIER:
+                frontier = frontier.tolist()
+        self.dist = dist.reshape(rows, cols)
+        self.flow = flow.reshape(rows, cols)
+
+    def distance(self, cell):
+        '''
+        Steps from cell to the nearest goal, -1 if there is none.
+        '''
+        return int(self.dist[cell[0]-1, cell[1]-1])
+
+    def reachable(self, cell):
+        return self.dist[cell[0]-1, cell[1]-1] >= 0
+
+    def path(self, start):
+        '''
+        The {cell: next cell} path from start to the nearest goal, in the
+        format trace_path uses. Empty if no goal can be reached.
+        '''
+        flow = self.flow
+        forward_path = {}
+        x, y = start
+        if self.dist[x-1, y-1] < 0:
+            return forward_path
+        while True:
+            d = flow.item(x-1, y-1)
+            if d == 0:
+                return forward_path
+            cell = (x, y)
+            if d == EAST:
+                y += 1
+            elif d == WEST:
+                y -= 1
+            elif d == SOUTH:
+                x += 1
+            else:
+                x -= 1
+            forward_path[cell] = (x, y)
+
+    def paths(self, agents):
+        '''
+        {agent: path} for all the agents, ready for Maze.trace_path.
+        '''
+        return {a: self.path((a.x, a.y)) for a in agents}
@@ -0,0 +1,370 @@
+'''
+Maze generation engines.
+They work on a flat bytearray of wall bits (see src/walls.py) where
+cell (x, y) is at index (x-1)*cols + (y-1), so every neighbour check is
+bounds arithmetic and an index lookup.
+'''
+import random
+from array import array
+import numpy as np
+from src.walls import EAST, WEST, NORTH, SOUTH
+
+
+def recursive_backtracker(rows, cols, start, pattern=None, rng=random):
+    '''
+    Recursive backtracking (depth first) generator.
+    Cost grows linearly with the number of cells.
+
+    args:
+        rows, cols: size of the Maze
+        start: the cell to start carving from (the goal of the Maze)
+        pattern: 'h' or 'v' to bias towards horizontal or vertical passages
+        rng: random number source with a choice() method
+
+    returns: (cells, parent)
+        cells: bytearray of the wall bits of every cell
+        parent: array of the flat index of the cell each cell was carved
+                from, -1 for the start cell
+    '''
+    n = rows*cols
+    cells = bytearray(n)
+    visited = bytearray(n)
+    parent = array('i', [-1])*n
+    choice = rng.choice
+
+    x, y = start
+    i = (x-1)*cols + (y-1)
+    # the start is pushed twice so that it is checked once more when the
+    # search has backtracked all the way to it
+    _stack = [i, i]
+    visited[i] = 1
+    bias_length = 2  # if pattern is 'v' or 'h'
+    if pattern is not None:
+        pattern = pattern.lower()
+    if pattern == 'h':
+        bias_length = max(cols//10, 2)
+    if pattern == 'v':
+        bias_length = max(rows//10, 2)
+    bias = 0
+
+    while _stack:
+        cell = []
+        bias += 1
+        if y < cols and not visited[i+1]:
+            cell.append(EAST)
+        if y > 1 and not visited[i-1]:
+            cell.append(WEST)
+        if x < rows and not visited[i+cols]:
+            cell.append(SOUTH)
+        if x > 1 and not visited[i-cols]:
+            cell.append(NORTH)
+        if cell:
+            if pattern == 'h' and bias <= bias_length:
+                if EAST in cell or WEST in cell:
+                    cell = [d for d in cell if d == EAST or d == WEST]
+            elif pattern == 'v' and bias <= bias_length:
+                if NORTH in cell or SOUTH in cell:
+                    cell = [d for d in cell if d == NORTH or d == SOUTH]
+            else:
+                bias = 0
+            d = choice(cell)
+            if d == EAST:
+                j = i+1
+                y += 1
+                cells[i] |= EAST
+                cells[j] |= WEST
+            elif d == WEST:
+                j = i-1
+                y -= 1
+                cells[i] |= WEST
+                cells[j] |= EAST
+            elif d == NORTH:
+                j = i-cols
+                x -= 1
+                cells[i] |= NORTH
+                cells[j] |= SOUTH
+            else:
+                j = i+cols
+                x += 1
+                cells[i] |= SOUTH
+                cells[j] |= NORTH
+            parent[j] = i
+            visited[j] = 1
+            _stack.append(j)
+            i = j
+        else:
+            i = _stack.pop()
+            x, y = divmod(i, cols)
+            x += 1
+            y += 1
+    return cells, parent
+
+
+def _horizontal_bias(pattern):
+    '''
+    Probability of carving a horizontal (E/W) passage rather than a
+    vertical (N/S) one for the 'h' and 'v' patterns.
+    '''
+    if pattern is not None and pattern.lower() == 'h':
+        return 0.8
+    if pattern is not None and pattern.lower() == 'v':
+        return 0.2
+    return 0.5
+
+
+def numpy_rng(rng):
+    '''
+    NumPy Generator seeded from rng so that random.seed() also
+    reproduces the vectorized generators.
+    '''
+    return np.random.default_rng(rng.getrandbits(64))
+
+
+def kruskal(rows, cols, start, pattern=None, rng=random):
+    '''
+    Randomized Kruskal's algorithm with a union-find over the cells.
+    Every wall is visited once in random order and removed if the two
+    cells aren't connected yet. With the 'h' pattern the East walls
+    (horizontal passages) get smaller keys so they tend to be removed
+    first, with 'v' the South walls (vertical passages), see
+    _horizontal_bias.
+    '''
+    n = rows*cols
+    cells = bytearray(n)
+    p = _horizontal_bias(pattern)
+    g = numpy_rng(rng)
+    idx = np.arange(n, dtype=np.int64).reshape(rows, cols)
+    # an edge a-b is stored as a*2 for the East wall and a*2+1 for the South wall
+    east = idx[:, :-1].ravel()*2
+    south = idx[:-1, :].ravel()*2+1
+    edges = np.concatenate((east, south))
+    keys = g.random(len(edges))
+    keys[:len(east)] *= 1-p
+    keys[len(east):] *= p
+    edges = edges[np.argsort(keys, kind='stable')].tolist()
+
+    root = list(range(n))
+    for e in edges:
+        a = e >> 1
+        b = a+cols if e & 1 else a+1
+        ra = a
+        while root[ra] != ra:
+            root[ra] = root[root[ra]]
+            ra = root[ra]
+        rb = b
+        while root[rb] != rb:
+            root[rb] = root[root[rb]]
+            rb = root[rb]
+        if ra == rb:
+            continue
+        root[ra] = rb
+        if e & 1:
+            cells[a] |= SOUTH
+            cells[b] |= NORTH
+        else:
+            cells[a] |= EAST
+            cells[b] |= WEST
+    return cells, None
+
+
+def wilson(rows, cols, start, pattern=None, rng=random):
+    '''
+    Wilson's algorithm: loop-erased random walks from every cell until
+    they hit the tree, which starts as the start cell. Without a pattern
+    the result is a uniform spanning tree; with one the walks prefer
+    horizontal or vertical steps.
+    '''
+    n = rows*cols
+    cells = bytearray(n)
+    in_tree = bytearray(n)
+    step = bytearray(n)  # direction the walk last left each cell by
+    p = _horizontal_bias(pattern)
+    rand = rng.random
+    in_tree[(start[0]-1)*cols + (start[1]-1)] = 1
+
+    order = list(range(n))
+    rng.shuffle(order)
+    for s in order:
+        if in_tree[s]:
+            continue
+        i = s
+        while not in_tree[i]:
+            x, y = divmod(i, cols)
+            horizontal = (y > 0 or y < cols-1) and (
+                rand() < p or not (x > 0 or x < rows-1))
+            if horizontal:
+                if y == 0 or (y < cols-1 and rand() < 0.5):
+                    step[i] = EAST
+                    i += 1
+                else:
+                    step[i] = WEST
+                    i -= 1
+            else:
+                if x == 0 or (x < rows-1 and rand() < 0.5):
+                    step[i] = SOUTH
+                    i += cols
+                else:
+                    step[i] = NORTH
+                    i -= cols
+        i = s
+        while not in_tree[i]:
+            d = step[i]
+            in_tree[i] = 1
+            cells[i] |= d
+            if d == EAST:
+                i += 1
+                cells[i] |= WEST
+            elif d == WEST:
+                i -= 1
+                cells[i] |= EAST
+            elif d == SOUTH:
+                i += cols
+                cells[i] |= NORTH
+            else:
+                i -= cols
+                cells[i] |= SOUTH
+    return cells, None
+
+
+def eller_rows(rows, cols, pattern=None, rng=random):
+    '''
+    Eller's algorithm, one row at a time.
+    Yields a bytearray with the wall bits of each row. Only the set label
+    of every column of the current row is kept, so memory is O(cols).
+    '''
+    p = _horizontal_bias(pattern)
+    rand = rng.random
+    labels = list(range(cols))
+    members = {c: [c] for c in range(cols)}
+    next_label = cols
+    north = bytearray(cols)
+    for x in range(rows):
+        row = bytearray(cols)
+        for c in range(cols):
+            if north[c]:
+                row[c] |= NORTH
+        last = x == rows-1
+        # join neighbouring cells of different sets
+        for c in range(cols-1):
+            a, b = labels[c], labels[c+1]
+            if a != b and (last or rand() < p):
+                row[c] |= EAST
+                row[c+1] |= WEST
+                if len(members[a]) < len(members[b]):
+                    a, b = b, a
+                for m in members[b]:
+                    labels[m] = a
+                members[a].extend(members.pop(b))
+        if last:
+            yield row
+            break
+        # every set goes down at least once
+        north = bytearray(cols)
+        for group in members.values():
+            north[group[int(rand()*len(group))]] = 1
+            for m in group:
+                if rand() >= p:
+                    north[m] = 1
+        members = {}
+        for c in range(cols):
+            if north[c]:
+                row[c] |= SOUTH
+                members.setdefault(labels[c], []).append(c)
+            else:
+                labels[c] = next_label
+                members[next_label] = [c]
+                next_label += 1
+        yield row
+
+
+def eller(rows, cols, start, pattern=None, rng=random):
+    '''
+    Eller's algorithm, see eller_rows.
+    '''
+    cells = bytearray()
+    for row in eller_rows(rows, cols, pattern, rng):
+        cells += row
+    return cells, None
+
+
+def binary_tree(rows, cols, start, pattern=None, rng=random):
+    '''
+    Binary tree algorithm, fully vectorized with NumPy.
+    Every cell opens either its North or its West wall, so the whole
+    Maze is built with a handful of array operations.
+    '''
+    g = numpy_rng(rng)
+    west = g.random((rows, cols)) < _horizontal_bias(pattern)
+    west[0, :] = True
+    west[:, 0] = False
+    north = ~west
+    north[0, :] = False
+    cells = np.zeros((rows, cols), dtype=np.uint8)
+    cells[west] |= WEST
+    cells[:, :-1][west[:, 1:]] |= EAST
+    cells[north] |= NORTH
+    cells[:-1, :][north[1:, :]] |= SOUTH
+    return cells, None
+
+
+def sidewinder(rows, cols, start, pattern=None, rng=random):
+    '''
+    Sidewinder algorithm, fully vectorized with NumPy.
+    The first row is one corridor. Every other row is cut into runs of
+    East passages and each run opens North from one random cell.
+    '''
+    g = numpy_rng(rng)
+    east = g.random((rows, cols)) < _horizontal_bias(pattern)
+    east[0, :] = True
+    east[:, -1] = False
+    cells = np.zeros((rows, cols), dtype=np.uint8)
+    cells[east] |= EAST
+    cells[:, 1:][east[:, :-1]] |= WEST
+    if rows > 1:
+        end = ~east[1:].ravel()
+        begin = np.empty_like(end)
+        begin[0] = True
+        begin[1:] = end[:-1]
+        first = np.flatnonzero(begin)
+        length = np.flatnonzero(end)-first+1
+        pick = first+(g.random(len(first))*length).astype(np.int64)
+        north = np.zeros(end.shape, dtype=bool)
+        north[pick] = True
+        north = north.reshape(rows-1, cols)
+        cells[1:][north] |= NORTH
+        cells[:-1][north] |= SOUTH
+    return cells, None
+
+
+def tree_parents(cells, rows, cols, root):
+    '''
+    Breadth first search over the open walls from the root cell index.
+    Returns the parent index of every reached cell (-1 for the root and
+    for unreached cells), the same format recursive_backtracker returns.
+    '''
+    cells = bytes(cells)
+    parent = array('i', [-1])*(rows*cols)
+    seen = bytearray(rows*cols)
+    seen[root] = 1
+    frontier = [root]
+    for i in frontier:
+        bits = cells[i]
+        for d, j in ((EAST, i+1), (WEST, i-1), (SOUTH, i+cols), (NORTH, i-cols)):
+            if bits & d and not seen[j]:
+                seen[j] = 1
+                parent[j] = i
+                frontier.append(j)
+    return parent
+
+
+# Registry of the generators create_maze(algorithm=...) can use.
+# A generator is called as fn(rows, cols, start, pattern, rng) and
+# returns (cells, parent) like recursive_backtracker; parent can be None.
+GENERATORS = {
+    'backtracker': recursive_backtracker,
+    'kruskal': kruskal,
+    'wilson': wilson,
+    'eller': eller,
+    'binary_tree': binary_tree,
+    'sidewinder': sidewinder,
+}
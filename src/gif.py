@@ -0,0 +1,278 @@
+'''
+Animated GIF export.
+Frames are rendered off-screen (src/raster.py) by walking the Agents along
+their paths, so no display or screen grab is needed. Every frame after the
+first only stores the rectangle that changed since the previous one, and
+is LZW encoded and written as soon as it is made, so the frames are never
+held in memory together.
+'''
+import struct
+import numpy as np
+from src.raster import Raster, path_cells, _ORIENT
+
+
+def _lzw(data, min_code_size):
+    '''
+    GIF flavoured LZW of the bytes data, as the code stream bytes.
+    '''
+    clear = 1 << min_code_size
+    end = clear + 1
+    out = bytearray()
+    acc = bits = 0
+    size = min_code_size + 1
+    table = {}
+    next_code = end + 1
+
+    def emit(code):
+        nonlocal acc, bits
+        acc |= code << bits
+        bits += size
+        while bits >= 8:
+            out.append(acc & 0xFF)
+            acc >>= 8
+            bits -= 8
+
+    emit(clear)
+    it = iter(data)
+    prefix = next(it)
+    for b in it:
+        key = prefix << 8 | b
+        code = table.get(key)
+        if code is not None:
+            prefix = code
+            continue
+        emit(prefix)
+        if next_code < 4096:
+            table[key] = next_code
+            next_code += 1
+            if next_code > 1 << size:
+                size += 1
+        else:
+            emit(clear)
+            table.clear()
+            size = min_code_size + 1
+            next_code = end + 1
+        prefix = b
+    emit(prefix)
+    emit(end)
+    if bits:
+        out.append(acc & 0xFF)
+    return bytes(out)
+
+
+class GifWriter:
+    '''
+    Writes an animated GIF89a frame by frame.
+    Use it as a context manager and call add_frame for every frame.
+    '''
+
+    def __init__(self, filename, width, height, palette, delay=100, loop=0):
+        '''
+        palette-->  list of (r, g, b), at most 256
+        delay-->    default time a frame is shown, in milliseconds
+        loop-->     number of times to play, 0 is forever
+        '''
+        self.filename = filename
+        self.width = width
+        self.height = height
+        self.palette = palette
+        self.delay = delay
+        self.loop = loop
+        self.frames = 0
+        self._f = None
+
+    def __enter__(self):
+        table_bits = max((len(self.palette)-1).bit_length(), 1)
+        self._min_code_size = max(table_bits, 2)
+        table = bytes(c for rgb in self.palette for c in rgb)
+        table = table.ljust(3 << table_bits, b'\0')
+        self._f = open(self.filename, 'wb')
+        self._f.write(b'GIF89a' + struct.pack('<HHBBB', self.width, self.height,
+                                              0x80 | (table_bits-1), 0, 0) + table)
+        # NETSCAPE2.0 application extension: loop count
+        self._f.write(b'\x21\xff\x0bNETSCAPE2.0\x03\x01' +
+                      struct.pack('<H', self.loop) + b'\0')
+        return self
+
+    def add_frame(self, image, left=0, top=0, delay=None):
+        '''
+        Writes image, a 2D uint8 array of palette indices, at (left, top)
+        over the previous frames (disposal: leave in place).
+        '''
+        delay = self.delay if delay is None else delay
+        h, w = image.shape
+        f = self._f
+        # graphic control extension: do not dispose, delay in 1/100 s
+        f.write(b'\x21\xf9\x04\x04' + struct.pack('<H', round(delay/10)) + b'\0\0')
+        f.write(b'\x2c' + struct.pack('<HHHHB', left, top, w, h, 0))
+        data = _lzw(np.ascontiguousarray(image, dtype=np.uint8).tobytes(),
+                    self._min_code_size)
+        f.write(bytes([self._min_code_size]))
+        for k in range(0, len(data), 255):
+            block = data[k:k+255]
+            f.write(bytes([len(block)]) + block)
+        f.write(b'\0')
+        self.frames += 1
+
+    def __exit__(self, *exc):
+        self._f.write(b'\x3b')
+        self._f.close()
+
+
+def _changed(prev, cur):
+    '''
+    (top, bottom, left, right) of the pixels that differ, None if none do.
+    '''
+    rows = np.flatnonzero((prev != cur).any(axis=1))
+    if rows.size == 0:
+        return None
+    cols = np.flatnonzero((prev[rows[0]:rows[-1]+1] != cur[rows[0]:rows[-1]+1]).any(axis=0))
+    return rows[0], rows[-1]+1, cols[0], cols[-1]+1
+
+
+def gif_frames(r, maze, paths, frames=None, show_marked=True):
+    '''
+    The frames of Agents walking along their paths, drawn on the Raster r.
+    Yields (image, left, top): the first frame is the whole image, every
+    later one only the rectangle that changed since the previous frame.
+    The colors are all in r.palette once the first frame is out.
+    Arguments as export_gif.
+    '''
+    walls = Raster(maze, r.cell_width, r.theme).draw_walls().image == 1
+    goal = getattr(maze, '_goal', None)
+    marked = set(maze.mark_cells) if show_marked else set()
+    shown = set()
+    walks = {a: path_cells((a.x, a.y), p, a.goal) for a, p in paths.items()}
+    orient = {a: a._orient % 4 for a in walks}
+    # Agents are drawn on top of the ones before them, like render does
+    order = {}
+    for a in list(maze._agents) + list(walks):
+        order.setdefault(a, len(order))
+    # {cell: {agent: [footprint, head]}}, the orientation each one was
+    # drawn in (None if not drawn), so a cell can be drawn again as a whole
+    drawn = {}
+    # register every color first, the palette goes in the GIF header
+    r._color('red')
+    r._color('green4')
+    for a in order:
+        r._color(a.color.value[0])
+        r._color(a.color.value[1])
+
+    def paint(a, cell, o, head):
+        color = a.color.value[0 if head else 1]
+        if a.shape == 'arrow':
+            r._draw_arrow(cell, o, color)
+        elif a.filled:
+            r.draw_cells([cell], color)
+        else:
+            r.draw_cells([cell], color, 0.25, 0.4)
+
+    def redraw(cell):
+        # from the background up, so that moving one Agent out of a cell
+        # leaves the other Agents drawn in it alone
+        r.draw_cells([cell], r.theme.value[0])
+        if cell == goal:
+            r.draw_cells([goal], 'green4')
+        if cell in shown:
+            r.draw_marked([cell])
+        for a in sorted(drawn.get(cell, ()), key=order.get):
+            foot, head = drawn[cell][a]
+            if foot is not None:
+                paint(a, cell, foot, False)
+            if head is not None:
+                paint(a, cell, head, True)
+
+    for a in order:
+        if a in walks:
+            cell, o = walks[a][0], orient[a]
+        else:
+            cell, o = (a.x, a.y), a._orient % 4
+        drawn.setdefault(cell, {})[a] = [None, o]
+    if goal is not None:
+        r.draw_cells([goal], 'green4')
+    for cell in drawn:
+        redraw(cell)
+    r.image[walls] = 1
+
+    steps = max((len(c)-1 for c in walks.values()), default=0)
+    if frames and frames < steps+1:
+        # frames steps spread evenly, the first and the last included
+        keep = set(np.linspace(0, steps, max(frames, 2)).round().astype(int).tolist())
+    else:
+        keep = None
+    height, width = r.image.shape
+    pad = r.cell_density + 1
+    yield r.image, 0, 0
+    prev = r.image.copy()
+    # pixel box (top, bottom, left, right) drawn on since the last frame
+    dirty = [height, 0, width, 0]
+    for k in range(1, steps+1):
+        for a, cells in walks.items():
+            if k >= len(cells):
+                continue
+            old, new = cells[k-1], cells[k]
+            # an arrow turns before it moves, its footprint shows the turn
+            move = (new[0]-old[0], new[1]-old[1])
+            if move in _ORIENT:
+                orient[a] = _ORIENT[move]
+            mark = drawn[old][a]
+            mark[1] = None
+            if a.footprints:
+                mark[0] = orient[a]
+            elif mark[0] is None:
+                del drawn[old][a]
+            drawn.setdefault(new, {}).setdefault(a, [None, None])[1] = orient[a]
+            if new in marked:
+                shown.add(new)
+            redraw(old)
+            redraw(new)
+            for x, y in (old, new):
+                top, bottom = r._px((x-1, x)).tolist()
+                left, right = r._px((y-1, y)).tolist()
+                dirty = [min(dirty[0], top-pad), max(dirty[1], bottom+pad),
+                         min(dirty[2], left-pad), max(dirty[3], right+pad)]
+        if keep is not None and k not in keep:
+            continue
+        t, b = max(dirty[0], 0), min(dirty[1], height)
+        le, ri = max(dirty[2], 0), min(dirty[3], width)
+        dirty = [height, 0, width, 0]
+        if t >= b or le >= ri:
+            continue
+        region = r.image[t:b, le:ri]
+        region[walls[t:b, le:ri]] = 1
+        box = _changed(prev[t:b, le:ri], region)
+        if box is None:
+            continue
+        t, b, le, ri = t+box[0], t+box[1], le+box[2], le+box[3]
+        yield r.image[t:b, le:ri], le, t
+        prev[t:b, le:ri] = r.image[t:b, le:ri]
+
+
+def export_gif(maze, paths, filename='animation.gif', frames=None, duration=100, cell_width=20, theme=None, show_marked=True):
+    '''
+    Animated GIF of Agents walking along their paths.
+
+    args:
+        maze: the Maze (or MazeModel) the Agents are on
+        paths: {agent: path} like trace_path (dictionary, list of cells or
+            string of moves); the Agents and paths are not changed
+        filename: output file
+        frames: number of frames, default is one per step; fewer frames
+            skip steps evenly, the last step is always shown
+        duration: milliseconds each frame is shown
+        cell_width: pixels per cell
+        theme: COLOR, default is the theme of the Maze
+        show_marked: show the marked cells once an Agent reaches them,
+            like trace_path with showMarked
+
+    returns: filename
+    '''
+    r = Raster(maze, cell_width, theme)
+    images = gif_frames(r, maze, paths, frames, show_marked)
+    first = next(images)
+    height, width = r.image.shape
+    with GifWriter(filename, width, height, r.palette, duration) as gif:
+        gif.add_frame(first[0])
+        for image, left, top in images:
+            gif.add_frame(image, left, top)
+    return filename
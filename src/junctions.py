@@ -0,0 +1,196 @@
+'''
+Junction graph of a Maze.
+Most cells of a Maze have exactly two open walls and just lead from one
+cell to the next. The junction graph keeps only the other cells (dead ends
+and branches) as nodes, with the corridors between them as weighted
+edges, so a search visits far fewer nodes. Paths found on the graph are
+expanded back to the cell by cell forward path dictionary.
+'''
+import heapq
+from array import array
+import numpy as np
+from src.walls import EAST, WEST, NORTH, SOUTH
+from src.solvers import _endpoints, a_star
+
+OPPOSITE = {EAST: WEST, WEST: EAST, NORTH: SOUTH, SOUTH: NORTH}
+
+
+class JunctionGraph:
+    '''
+    nodes-->    bytearray, 1 for the cells that are nodes of the graph
+    edges-->    list of corridors (a, da, b, db, length): from node a leaving
+                by direction da, the corridor reaches node b, entering it
+                from direction db, after length steps
+    adj-->      {node: [edge ids]}
+    edge_of, offset-->  for the cells inside a corridor, the edge they are on
+                        and their number of steps from its node a (-1 and 0
+                        for nodes and for cells on corridors without any node)
+    version-->  _walls_version of the Maze the graph was built from
+    '''
+
+    def __init__(self, maze):
+        rows, cols = maze.rows, maze.cols
+        self.cols = cols
+        self.version = maze._walls_version
+        w = maze._walls
+        degree = (w & 1)+(w >> 1 & 1)+(w >> 2 & 1)+(w >> 3 & 1)
+        self.walls = w.tobytes()
+        self.nodes = bytearray((degree != 2).astype(np.uint8).tobytes())
+        n = rows*cols
+        self.edge_of = array('i', [-1])*n
+        self.offset = array('i', [0])*n
+        self.edges = []
+        self.adj = {}
+        walls, nodes = self.walls, self.nodes
+        move = {EAST: 1, WEST: -1, SOUTH: cols, NORTH: -cols}
+        for a in np.flatnonzero(degree.ravel() != 2).tolist():
+            self.adj.setdefault(a, [])
+            for da in (EAST, WEST, SOUTH, NORTH):
+                if not walls[a] & da:
+                    continue
+                i, d, length = a, da, 0
+                while True:
+                    i += move[d]
+                    length += 1
+                    came = OPPOSITE[d]
+                    if nodes[i]:
+                        break
+                    d = walls[i] & ~came
+                # every corridor is found from both of its ends, keep one
+                if (i, came) < (a, da):
+                    continue
+                e = len(self.edges)
+                self.edges.append((a, da, i, came, length))
+                self.adj[a].append(e)
+                if i != a:
+                    self.adj.setdefault(i, []).append(e)
+        for e, (a, da, b, db, length) in enumerate(self.edges):
+            for k, i in enumerate(self.corridor(a, da, length)[1:-1], 1):
+                self.edge_of[i] = e
+                self.offset[i] = k
+
+    def corridor(self, a, da, steps):
+        '''
+        Flat indices of the cells from a, leaving by direction da, for the
+        given number of steps (both ends included).
+        '''
+        walls, cols = self.walls, self.cols
+        cells = [a]
+        i, d = a, da
+        for _ in range(steps):
+            i += 1 if d == EAST else -1 if d == WEST else cols if d == SOUTH else -cols
+            cells.append(i)
+            d = walls[i] & ~OPPOSITE[d]
+        return cells
+
+    def _attach(self, i):
+        '''
+        The nodes a cell can be reached from: [(node, distance, cells from
+        the node to the cell)] where cells is a function building the list.
+        '''
+        if self.nodes[i]:
+            return [(i, 0, lambda: [i])]
+        e = self.edge_of[i]
+        a, da, b, db, length = self.edges[e]
+        k = self.offset[i]
+        return [(a, k, lambda: self.corridor(a, da, k)),
+                (b, length-k, lambda: self.corridor(b, db, length-k))]
+
+    def solve(self, s, t, stats=None):
+        '''
+        Shortest path between flat indices s and t as a list of flat
+        indices, or None if t can't be reached from s.
+        '''
+        if s == t:
+            return [s]
+        expanded = 0
+        best, best_path = -1, None
+        goal_links = {}
+        for node, d, cells in self._attach(t):
+            if node not in goal_links or d < goal_links[node][0]:
+                goal_links[node] = (d, cells)
+        if not self.nodes[s] and not self.nodes[t] and self.edge_of[s] == self.edge_of[t]:
+            # both inside the same corridor
+            a, da, b, db, length = self.edges[self.edge_of[s]]
+            ks, kt = self.offset[s], self.offset[t]
+            best = abs(ks-kt)
+            cells = self.corridor(a, da, max(ks, kt))[min(ks, kt):]
+            best_path = cells if ks < kt else cells[::-1]
+
+        dist = {}
+        prev = {}
+        heap = []
+        for node, d, cells in self._attach(s):
+            if node not in dist or d < dist[node]:
+                dist[node] = d
+                prev[node] = (None, cells)
+                heapq.heappush(heap, (d, node))
+        while heap:
+            d, u = heapq.heappop(heap)
+            if d > dist[u] or (best >= 0 and d >= best):
+                continue
+            expanded += 1
+            if u in goal_links and (best < 0 or d+goal_links[u][0] < best):
+                best = d+goal_links[u][0]
+                best_path = u
+            for e in self.adj[u]:
+                a, da, b, db, length = self.edges[e]
+                v, du = (b, da) if a == u else (a, db)
+                nd = d+length
+                if len(self.adj[v]) == 1 and v not in goal_links:
+                    # a dead end, nothing past it
+                    continue
+                if v not in dist or nd < dist[v]:
+                    dist[v] = nd
+                    prev[v] = (u, (u, du, length))
+                    heapq.heappush(heap, (nd, v))
+        if stats is not None:
+            stats['nodes_expanded'] = expanded
+        if best < 0:
+            return None
+        if isinstance(best_path, list):
+            return best_path
+        # expand node -> goal, then the chain of edges back to the start
+        u = best_path
+        parts = [goal_links[u][1]()]
+        while True:
+            p, link = prev[u]
+            if p is None:
+                parts.append(link()[::-1])
+                break
+            parts.append(self.corridor(*link))
+            u = p
+        cells = parts.pop()
+        for part in reversed(parts):
+            cells.extend(part[1:])
+        return cells
+
+
+def junction_graph(maze):
+    '''
+    The junction graph of the Maze, built once and cached on the Maze
+    until its walls change.
+    '''
+    graph = getattr(maze, '_junction_graph', None)
+    if graph is None or graph.version != maze._walls_version:
+        graph = JunctionGraph(maze)
+        maze._junction_graph = graph
+    return graph
+
+
+def solve(maze, start=None, goal=None, stats=None):
+    '''
+    Shortest path on the junction graph of the Maze.
+    Same arguments and result as the solvers of src/solvers.py.
+    '''
+    s, t = _endpoints(maze, start, goal)
+    graph = junction_graph(maze)
+    if (not graph.nodes[s] and graph.edge_of[s] < 0) or (not graph.nodes[t] and graph.edge_of[t] < 0):
+        # a ring of corridor cells without any junction
+        return a_star(maze, start, goal, stats=stats)
+    cells = graph.solve(s, t, stats)
+    if cells is None:
+        return {}
+    cols = maze.cols
+    return {(i//cols+1, i % cols+1): (j//cols+1, j % cols+1)
+            for i, j in zip(cells, cells[1:])}
@@ -0,0 +1,167 @@
+'''
+Loop injection.
+Opens extra walls in a perfect Maze so that there is more than one path
+between cells. A wall is never opened if that would leave a 2x2 block of
+cells with no wall inside it, to avoid too much blank (clear) path.
+Candidates are picked with NumPy in one go, then checked and opened in a
+single pass over a flat bytearray, so the cost is linear in the cells.
+'''
+import random
+import numpy as np
+from src.walls import EAST, WEST, NORTH, SOUTH
+from src.generators import numpy_rng
+
+_DIRECTIONS = np.array([EAST, WEST, NORTH, SOUTH], dtype=np.uint8)
+# candidates turned into Python lists at a time
+CHUNK = 1 << 16
+
+
+def _closed(walls):
+    '''
+    (4, n) bool array, the walls of every cell that are closed and have a
+    cell behind them, in _DIRECTIONS order.
+    '''
+    rows, cols = walls.shape
+    closed = np.empty((4, rows, cols), dtype=bool)
+    for k, d in enumerate(_DIRECTIONS):
+        closed[k] = (walls & d) == 0
+    closed[0, :, -1] = False
+    closed[1, :, 0] = False
+    closed[2, 0, :] = False
+    closed[3, -1, :] = False
+    return closed.reshape(4, -1)
+
+
+def _is_cyclic(w, i, d, cols):
+    '''
+    True if opening the wall d of cell i (flat index) would open a 2x2 block.
+    '''
+    if d == WEST:
+        i, d = i-1, EAST
+    elif d == NORTH:
+        i, d = i-cols, SOUTH
+    if d == EAST:
+        j = i+1
+        return bool((w[i] & SOUTH and w[j] & SOUTH and w[i+cols] & EAST) or
+                    (w[i] & NORTH and w[j] & NORTH and w[i-cols] & EAST))
+    j = i+cols
+    return bool((w[i] & EAST and w[j] & EAST and w[i+1] & SOUTH) or
+                (w[i] & WEST and w[j] & WEST and w[i-1] & SOUTH))
+
+
+def _open(w, candidates, target, cols):
+    '''
+    Tries the walls of candidates, chunks of (cells, directions) lists, in
+    order and opens the ones that are still closed and keep the rule, until
+    target walls are opened. Returns the number of walls opened and the
+    number turned down by the rule.
+    '''
+    step = {EAST: 1, WEST: -1, NORTH: -cols, SOUTH: cols}
+    back = {EAST: WEST, WEST: EAST, NORTH: SOUTH, SOUTH: NORTH}
+    opened = 0
+    rejected = 0
+    for cells, dirs in candidates:
+        for i, d in zip(cells, dirs):
+            if opened >= target:
+                return opened, rejected
+            if w[i] & d:
+                continue
+            if _is_cyclic(w, i, d, cols):
+                rejected += 1
+                continue
+            w[i] |= d
+            w[i+step[d]] |= back[d]
+            opened += 1
+    return opened, rejected
+
+
+def _chunks(cells, dirs):
+    '''
+    The candidates as lists, a chunk at a time, so that only the ones
+    tried are turned into Python objects.
+    '''
+    for k in range(0, cells.size, CHUNK):
+        yield cells[k:k+CHUNK].tolist(), dirs[k:k+CHUNK].tolist()
+
+
+def _one_per_cell(closed, cells, g):
+    '''
+    Every cell with a closed wall in a random order, each with one of its
+    closed walls picked at random.
+    '''
+    c = closed[:, cells].view(np.uint8)
+    count = c.sum(axis=0, dtype=np.uint8)
+    cells, c, count = cells[count > 0], c[:, count > 0], count[count > 0]
+    order = g.permutation(cells.size)
+    cells, c, count = cells[order], c[:, order], count[order]
+    pick = (g.random(cells.size)*count).astype(np.uint8)
+    # index of the pick-th closed wall of every cell
+    seen = c[0].copy()
+    k = (seen <= pick).view(np.uint8)
+    for row in c[1:3]:
+        seen += row
+        k += seen <= pick
+    return _chunks(cells, np.take(_DIRECTIONS, k))
+
+
+def _every_wall(closed, cells, g):
+    '''
+    Every closed wall of the cells, in a random order.
+    '''
+    k, j = np.nonzero(closed[:, cells])
+    order = g.permutation(k.size)
+    return _chunks(cells[j[order]], np.take(_DIRECTIONS, k[order]))
+
+
+def add_loops(walls, path_cells, loop_percent=0, loop_count=None, rng=random, stats=None):
+    '''
+    Opens extra walls, changing walls in place.
+
+    args:
+        walls: (rows, cols) uint8 wall array (src/walls.py) of the Maze
+        path_cells: flat indices of the cells on the solution path
+        loop_percent: like create_maze, every cell on and off the path gets
+            one try at opening a random closed wall, up to loop_percent/3
+            percent of the cells of each group
+        loop_count: exact number of walls to open instead of a percentage,
+            shared between the path and the other cells by their size.
+            Fewer are opened only if the rule leaves no more walls to open.
+        rng: random.Random (or the random module) used for the choices
+        stats: optional dictionary, 'walls_removed' and 'is_cyclic_rejections'
+            (walls left closed by the 2x2 rule) are added to it
+
+    returns: the number of walls opened
+    '''
+    rows, cols = walls.shape
+    n = rows*cols
+    g = numpy_rng(rng)
+    on_path = np.zeros(n, dtype=bool)
+    on_path[np.asarray(path_cells, dtype=np.int64)] = True
+    groups = (np.flatnonzero(on_path), np.flatnonzero(~on_path))
+    closed = _closed(walls)
+    w = bytearray(walls.tobytes())
+    # [walls opened, walls turned down by the 2x2 rule]
+    counts = [0, 0]
+
+    def open_walls(candidates, target):
+        opened, rejected = _open(w, candidates, target, cols)
+        counts[0] += opened
+        counts[1] += rejected
+
+    if loop_count is None:
+        for cells in groups:
+            target = cells.size/3*loop_percent/100
+            open_walls(_one_per_cell(closed, cells, g), target)
+    else:
+        path_target = round(loop_count*groups[0].size/n)
+        open_walls(_every_wall(closed, groups[0], g), path_target)
+        open_walls(_every_wall(closed, groups[1], g), loop_count-counts[0])
+        if counts[0] < loop_count:
+            # the cells off the path ran out of walls, back to the path
+            open_walls(_every_wall(closed, groups[0], g), loop_count-counts[0])
+    opened, rejected = counts
+    if stats is not None:
+        stats['walls_removed'] = stats.get('walls_removed', 0) + opened
+        stats['is_cyclic_rejections'] = stats.get('is_cyclic_rejections', 0) + rejected
+    walls[:] = np.frombuffer(w, dtype=np.uint8).reshape(rows, cols)
+    return opened
@@ -0,0 +1,154 @@
+'''
+Binary maze file.
+A small header (size, goal, seed and generator of the Maze) followed by
+the wall bits of every cell (src/walls.py), one byte per cell, row by row.
+Rows are written one at a time, so a Maze can be streamed to disk without
+ever being held in memory, and the wall data can be memory mapped back.
+create_maze(save_maze='binary') writes one, and create_maze(load_maze=...)
+maps it, so loading takes the same time at any size. Version 1 files
+(without goal, seed and generator) still load.
+'''
+import random
+import struct
+from collections import namedtuple
+import numpy as np
+from src.generators import eller_rows
+
+MAGIC = b'PYMZ'
+VERSION = 2
+# magic, version, header size, rows, cols
+_HEADER = struct.Struct('<4sHHQQ')
+# version 2 adds: goal x, goal y (0 if unknown), seed flag, seed,
+# length of the generator name, followed by the name itself
+_HEADER_V2 = struct.Struct('<QQBqH')
+# the wall data starts at a multiple of this
+_ALIGN = 64
+
+MazeHeader = namedtuple(
+    'MazeHeader', ['rows', 'cols', 'offset', 'goal', 'seed', 'generator'])
+
+
+def is_maze_file(filename):
+    '''
+    True if the file starts with the binary maze file magic.
+    '''
+    with open(filename, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def _pack_header(rows, cols, goal=None, seed=None, generator=None):
+    '''
+    The version 2 header, padded so that the wall data is aligned.
+    Seeds that are not int64 integers are not stored.
+    '''
+    gx, gy = goal if goal is not None else (0, 0)
+    has_seed = isinstance(seed, int) and -2**63 <= seed < 2**63
+    name = (generator or '').encode()
+    size = _HEADER.size+_HEADER_V2.size+len(name)
+    size += -size % _ALIGN
+    head = _HEADER.pack(MAGIC, VERSION, size, rows, cols)
+    head += _HEADER_V2.pack(gx, gy, has_seed, seed if has_seed else 0,
+                            len(name)) + name
+    return head.ljust(size, b'\0')
+
+
+class MazeFileWriter:
+    '''
+    Writes a binary maze file row by row.
+    Use it as a context manager and call write_row once per row.
+    goal, seed and generator are optional and stored in the header.
+    '''
+
+    def __init__(self, filename, rows, cols, goal=None, seed=None, generator=None):
+        self.filename = filename
+        self.rows = rows
+        self.cols = cols
+        self.goal = goal
+        self.seed = seed
+        self.generator = generator
+        self._written = 0
+        self._f = None
+
+    def __enter__(self):
+        self._f = open(self.filename, 'wb')
+        self._f.write(_pack_header(self.rows, self.cols, self.goal,
+                                   self.seed, self.generator))
+        return self
+
+    def write_row(self, row):
+        if len(row) != self.cols:
+            raise ValueError(f'row has {len(row)} cells, expected {self.cols}')
+        self._f.write(row)
+        self._written += 1
+
+    def __exit__(self, *exc):
+        self._f.close()
+        if exc[0] is None and self._written != self.rows:
+            raise ValueError(
+                f'{self._written} rows written, expected {self.rows}')
+
+
+def write_maze_file(filename, walls, goal=None, seed=None, generator=None):
+    '''
+    Writes the (rows, cols) uint8 wall array to a binary maze file.
+    '''
+    rows, cols = walls.shape
+    with open(filename, 'wb') as f:
+        f.write(_pack_header(rows, cols, goal, seed, generator))
+        f.write(np.ascontiguousarray(walls, dtype=np.uint8).tobytes())
+    return filename
+
+
+def read_header(filename):
+    '''
+    Returns the MazeHeader (rows, cols, offset of the wall data, goal, seed,
+    generator) of a binary maze file. goal, seed and generator are None if
+    the file doesn't have them (version 1 files never do).
+    '''
+    with open(filename, 'rb') as f:
+        head = f.read(_HEADER.size+_HEADER_V2.size)
+        if len(head) < _HEADER.size or head[:len(MAGIC)] != MAGIC:
+            raise ValueError(f'{filename} is not a maze file!')
+        magic, version, size, rows, cols = _HEADER.unpack_from(head)
+        if version > VERSION:
+            raise ValueError(f'{filename} has unsupported version {version}!')
+        goal = seed = generator = None
+        if version >= 2:
+            gx, gy, has_seed, s, length = _HEADER_V2.unpack_from(head, _HEADER.size)
+            if gx:
+                goal = (gx, gy)
+            if has_seed:
+                seed = s
+            if length:
+                generator = f.read(length).decode()
+    return MazeHeader(rows, cols, size, goal, seed, generator)
+
+
+def read_maze_file(filename, mmap=True):
+    '''
+    Returns (rows, cols, walls) where walls is the (rows, cols) uint8 array.
+    With mmap the array is a copy-on-write numpy.memmap of the file, so
+    loading takes the same time whatever the size and changes to the
+    array never reach the file. Else the file is read into memory.
+    '''
+    rows, cols, offset = read_header(filename)[:3]
+    if mmap and rows*cols:
+        walls = np.memmap(filename, dtype=np.uint8, mode='c', offset=offset,
+                          shape=(rows, cols))
+    else:
+        walls = np.fromfile(filename, dtype=np.uint8, count=rows*cols,
+                            offset=offset).reshape(rows, cols)
+    return rows, cols, walls
+
+
+def stream_maze(filename, rows, cols, pattern=None, rng=random):
+    '''
+    Generates a rows x cols Maze with Eller's algorithm and writes it to a
+    binary maze file as it goes. Only one row is in memory at a time, so
+    peak memory is O(cols) whatever the number of rows.
+    The file can be loaded with Maze.create_maze(load_maze=filename).
+    '''
+    with MazeFileWriter(filename, rows, cols, generator='eller') as w:
+        for row in eller_rows(rows, cols, pattern, rng):
+            w.write_row(row)
+    return filename
@@ -0,0 +1,311 @@
+import random
+import logging
+import datetime
+from collections import deque
+import numpy as np
+from src.theme import COLOR
+from src.generators import GENERATORS, tree_parents
+from src.loops import add_loops
+from src.csvio import read_maze_csv, write_maze_csv
+from src.mazefile import is_maze_file, read_header, read_maze_file, write_maze_file
+from src.walls import EAST, WEST, NORTH, SOUTH, new_walls, MazeMapView, CellGrid
+from src.stats import phase
+
+logger = logging.getLogger(__name__)
+
+# values of the save_maze argument of create_maze
+SAVE_FORMATS = (False, True, 'csv', 'csv.gz', 'binary')
+
+
+class MazeModel:
+    '''
+    The GUI-free part of the Maze: the walls, generation, loading, saving and
+    the solution path. Importing this module doesn't import tkinter or PIL, so
+    mazes can be generated and solved on machines without a display
+    (python -X importtime -c "import src.model" stays under 100 ms, almost
+    all of it NumPy). The Maze class of src/maze.py adds the Tkinter
+    drawing on top of it.
+    Diagnostic output goes to the logging logger of the module, use
+    logging.basicConfig(level=logging.DEBUG) to see it.
+    '''
+
+    def __init__(self, rows=10, cols=10):
+        '''
+        rows--> No. of rows of the Maze
+        cols--> No. of columns of the Maze
+        Need to pass just the two arguments. The rest will be assigned automatically
+        maze_map--> Read-only view of the walls. Keys will be cells and
+                    values will be a dictionary like view with keys=['E','W','N','S'] for
+                    East West North South and values will be 0 or 1. 0 means that 
+                    direction(EWNS) is blocked. 1 means that direction is open.
+        _walls--> The actual wall store behind maze_map. A (rows, cols) uint8
+                  NumPy array with the E/W/N/S bit flags of src/walls.py
+        _walls_version--> Goes up every time the walls change, so that data
+                          cached from the walls (like the junction graph of
+                          src/junctions.py) knows when it is out of date.
+        grid--> A sequence of all cells
+        path--> Shortest path from start(bottom right) to goal(by default top left)
+                It will be a dictionary, only worked out when it is first read
+        _tree-->    Parent array of a generated perfect Maze and the _walls_version
+                    it belongs to, path is built from it while the walls are unchanged.
+                    The array is None until _parents() is called if the
+                    generator didn't return one
+        _agents-->  A list of aganets on the Maze
+        markedCells-->  Will be used to mark some particular cell during
+                        path trace by the Agent.
+        _canvas-->  Always None here. Only a drawn Maze has a canvas, so the
+                    Agents check it to know if there is anything to draw on.
+        _stats-->   The stats given to create_maze, the path and drawing
+                    phases that come later are added to it too
+        theme-->    COLOR theme the Maze is drawn in, create_maze sets it,
+                    dark until then
+        '''
+        self.rows = rows
+        self.cols = cols
+        self._walls_version = 0
+        self._tree = None
+        self._stats = None
+        self.theme = COLOR.dark
+        self.grid = []
+        self.path = {}
+        self._canvas = None
+        self._agents = []
+        self.mark_cells = []
+
+    @property
+    def grid(self):
+        return self._grid
+
+    @grid.setter
+    def grid(self, n):
+        '''
+        Resets the Maze to rows x cols cells with all the walls closed.
+        '''
+        self._use_walls(new_walls(self.rows, self.cols))
+
+    def _use_walls(self, walls):
+        '''
+        Makes walls, a (rows, cols) uint8 array, the wall store of the Maze.
+        '''
+        self.rows, self.cols = walls.shape
+        self._grid = CellGrid(self.rows, self.cols)
+        self._walls = walls
+        self._maze_map = MazeMapView(walls)
+        self._walls_version += 1
+
+    @property
+    def maze_map(self):
+        return self._maze_map
+
+    @property
+    def path(self):
+        '''
+        Worked out the first time it is read after the walls change: from the
+        tree of the generator for a perfect Maze, else by breadth first search.
+        '''
+        if self._path_version != self._walls_version:
+            path = {}
+            with phase(self._stats, 'path'):
+                parent = self._parents()
+                if parent is not None:
+                    cols = self.cols
+                    path = {(j//cols+1, j % cols+1): (p//cols+1, p % cols+1)
+                            for j, p in enumerate(parent) if p >= 0}
+                elif getattr(self, '_goal', None) is not None:
+                    path = self._breadth_first_search((self.rows, self.cols))
+            self.path = path
+        return self._path
+
+    def _parents(self):
+        '''
+        Parent array of the generated perfect Maze (see _tree), worked out
+        from the walls the first time it is asked for if the generator
+        didn't return it. None if the walls changed since generation.
+        '''
+        if self._tree is None or self._tree[1] != self._walls_version:
+            return None
+        if self._tree[0] is None:
+            goal = (self._goal[0]-1)*self.cols + (self._goal[1]-1)
+            self._tree = (tree_parents(self._walls.tobytes(), self.rows, self.cols, goal),
+                          self._tree[1])
+        return self._tree[0]
+
+    @path.setter
+    def path(self, path):
+        self._path = path
+        self._path_version = self._walls_version
+
+    def _open_east_wall(self, x, y):
+        '''
+        To remove the East Wall of the cell
+        '''
+        self._walls_version += 1
+        self._walls[x-1, y-1] |= EAST
+        if y+1 <= self.cols:
+            self._walls[x-1, y] |= WEST
+
+    def _open_west_wall(self, x, y):
+        self._walls_version += 1
+        self._walls[x-1, y-1] |= WEST
+        if y-1 > 0:
+            self._walls[x-1, y-2] |= EAST
+
+    def _open_north_wall(self, x, y):
+        self._walls_version += 1
+        self._walls[x-1, y-1] |= NORTH
+        if x-1 > 0:
+            self._walls[x-2, y-1] |= SOUTH
+
+    def _open_south_wall(self, x, y):
+        self._walls_version += 1
+        self._walls[x-1, y-1] |= SOUTH
+        if x+1 <= self.rows:
+            self._walls[x, y-1] |= NORTH
+
+    def _breadth_first_search(self, cell, stats=None):
+        '''
+        Breadth First Search
+        To generate the shortest path.
+        This will be used only when there are multiple paths (loop_percent>0) or
+        Maze is loaded from a file, the first time path is read.
+        If a perfect Maze is generated and without the load file, this method will
+        not be used since the Maze generation will calculate the path.
+        The number of cells expanded is stored as stats['nodes_expanded'] if
+        a stats dictionary is given.
+        '''
+        frontier = deque()
+        frontier.append(cell)
+        path = {}
+        visited = {(self.rows, self.cols)}
+        logger.debug('breadth first search of a %dx%d Maze from %s', self.rows, self.cols, cell)
+        walls = self._walls
+        while len(frontier) > 0:
+            cell = frontier.popleft()
+            bits = walls.item(cell[0]-1, cell[1]-1)
+            if bits & WEST and (cell[0], cell[1]-1) not in visited:
+                next_cell = (cell[0], cell[1]-1)
+                path[next_cell] = cell
+                frontier.append(next_cell)
+                visited.add(next_cell)
+            if bits & SOUTH and (cell[0]+1, cell[1]) not in visited:
+                next_cell = (cell[0]+1, cell[1])
+                path[next_cell] = cell
+                frontier.append(next_cell)
+                visited.add(next_cell)
+            if bits & EAST and (cell[0], cell[1]+1) not in visited:
+                next_cell = (cell[0], cell[1]+1)
+                path[next_cell] = cell
+                frontier.append(next_cell)
+                visited.add(next_cell)
+            if bits & NORTH and (cell[0]-1, cell[1]) not in visited:
+                next_cell = (cell[0]-1, cell[1])
+                path[next_cell] = cell
+                frontier.append(next_cell)
+                visited.add(next_cell)
+        if stats is not None:
+            # every cell reached was expanded, the start too
+            stats['nodes_expanded'] = len(path)+1
+        forward_path = {}
+        cell = self._goal
+        while cell != (self.rows, self.cols):
+            try:
+                forward_path[path[cell]] = cell
+                cell = path[cell]
+            except:
+                logger.info('Path to goal not found!')
+                return
+        return forward_path
+
+    def create_maze(self, x=1, y=1, pattern=None, loop_percent=0, save_maze=False, load_maze=None, theme: COLOR = COLOR.dark, algorithm='backtracker', seed=None, loop_count=None, stats=None):
+        '''
+        Function to create a random maze
+        
+        args: 
+            x: x coordinate of the end point
+            y: y coordinate of the end point 
+            pattern: Either horizontal or vertical, the maze structure will be according to the pattern like more vertical or horizontal
+            loop_percent: number of paths/loops from start to the end
+            save_maze: save the generated maze for reference, True or 'csv' for a csv
+                       file, 'csv.gz' for a gzip compressed one (src/csvio.py),
+                       'binary' for a binary maze file of src/mazefile.py
+            load_maze: provide the csv file (or a binary file of src/mazefile.py) to generate a desired maze
+                       The goal stored in a binary file is used instead of x and y
+            theme: theme
+            algorithm: name of the generator in src/generators.py GENERATORS
+                       ('backtracker', 'kruskal', 'wilson', 'eller', 'binary_tree',
+                       'sidewinder') or a generator function with the same signature
+            seed: seed of the random choices of the generator and of the loops,
+                  the same seed gives the same Maze. Default uses the random module
+            loop_count: exact number of extra passages to open, instead of
+                        loop_percent (see src/loops.py)
+            stats: optional src/stats.py Stats, gets the time of every phase
+                   ('carving', 'loops', 'load', 'save', then 'path' and
+                   'drawing' when they happen) and the counters 'walls_carved',
+                   'walls_removed' and 'is_cyclic_rejections'
+        '''
+        self.theme = theme
+        self._goal = (x, y)
+        if (isinstance(theme, str)):
+            if (theme in COLOR.__members__):
+                self.theme = COLOR[theme]
+            else:
+                raise ValueError(f'{theme} is not a valid theme COLOR!')
+        if save_maze not in SAVE_FORMATS:
+            raise ValueError(f'{save_maze} is not a valid save format!')
+        self._seed = seed
+        self._stats = stats
+        self._algorithm = getattr(algorithm, '__name__', algorithm)
+        generator = algorithm
+        if not callable(algorithm):
+            if algorithm in GENERATORS:
+                generator = GENERATORS[algorithm]
+            else:
+                raise ValueError(f'{algorithm} is not a valid maze generator!')
+
+        # if Maze is to be generated randomly
+        if not load_maze:
+            rng = random if seed is None else random.Random(seed)
+            with phase(stats, 'carving'):
+                cells, parent = generator(
+                    self.rows, self.cols, (x, y), pattern, rng)
+                self._walls[:] = np.frombuffer(cells, dtype=np.uint8).reshape(
+                    self.rows, self.cols)
+                self._walls_version += 1
+                cols = self.cols
+                goal = (x-1)*cols + (y-1)
+                # parent may be None, it is then only worked out when needed
+                self._tree = (parent, self._walls_version)
+            if stats is not None:
+                # every open wall is a bit in the cells on both of its sides
+                stats['walls_carved'] = int(np.unpackbits(self._walls).sum())//2
+
+            # Multiple Path Loops
+            if loop_percent != 0 or loop_count:
+                with phase(stats, 'loops'):
+                    parent = self._parents()
+                    path_cells = [self.rows*cols-1]
+                    while path_cells[-1] != goal:
+                        path_cells.append(parent[path_cells[-1]])
+                    add_loops(self._walls, path_cells, loop_percent, loop_count, rng, stats)
+                self._walls_version += 1
+        elif is_maze_file(load_maze):
+            # Load Maze from a binary maze file, the walls are memory mapped
+            with phase(stats, 'load'):
+                header = read_header(load_maze)
+                self._use_walls(read_maze_file(load_maze)[2])
+            if header.goal is not None:
+                self._goal = header.goal
+            self._seed, self._algorithm = header.seed, header.generator
+        else:
+            # Load Maze from CSV file (or .csv.gz), in one pass
+            with phase(stats, 'load'):
+                self._use_walls(read_maze_csv(load_maze))
+        dt_string = datetime.datetime.now().strftime("%Y-%m-%d--%H-%M-%S")
+        with phase(stats if save_maze else None, 'save'):
+            if save_maze == 'binary':
+                write_maze_file(f'Maze--{dt_string}.pymz', self._walls, self._goal,
+                                self._seed, self._algorithm)
+            elif save_maze == 'csv.gz':
+                write_maze_csv(f'Maze--{dt_string}.csv.gz', self._walls)
+            elif save_maze:
+                write_maze_csv(f'Maze--{dt_string}.csv', self._walls)
@@ -0,0 +1,135 @@
+'''
+Motion plans.
+A path in any format trace_path takes (a {cell: next cell} dictionary, a
+list of cells or a string of moves) is compiled once into a compact array
+of steps: moves and the turns an arrow Agent makes before a move. Playing
+a plan back is a walk over that array, the path itself is never changed.
+'''
+from array import array
+
+# steps of a plan: a move North, East, South or West, then the turns
+MOVE_N, MOVE_E, MOVE_S, MOVE_W = 0, 1, 2, 3
+TURN_CW = 4
+TURN_CCW = 5
+# to a cell that isn't next to the current one (a list path can do this)
+JUMP = 6
+
+# (dx, dy) of the moves, a move is also the orientation an arrow ends in
+MOVES = ((-1, 0), (0, 1), (1, 0), (0, -1))
+_MOVE = {m: k for k, m in enumerate(MOVES)}
+_LETTERS = {'N': MOVE_N, 'E': MOVE_E, 'S': MOVE_S, 'W': MOVE_W}
+
+
+class MotionPlan:
+    '''
+    ops-->      array('B') of steps (MOVE_N to MOVE_W, TURN_CW, TURN_CCW, JUMP)
+    jumps-->    target cells of the JUMP steps, in order
+    start-->    cell the plan starts from
+    end-->      cell the plan ends in
+    '''
+
+    __slots__ = ('ops', 'jumps', 'start', 'end')
+
+    def __init__(self, start):
+        self.ops = array('B')
+        self.jumps = []
+        self.start = start
+        self.end = start
+
+    def __len__(self):
+        return len(self.ops)
+
+    def cells(self):
+        '''
+        The cell after every step of the plan.
+        '''
+        x, y = self.start
+        jumps = iter(self.jumps)
+        out = []
+        for op in self.ops:
+            if op < TURN_CW:
+                x, y = x+MOVES[op][0], y+MOVES[op][1]
+            elif op == JUMP:
+                x, y = next(jumps)
+            out.append((x, y))
+        return out
+
+
+def _turns(ops, orient, mov):
+    '''
+    Adds the turns from orient to mov, the short way round, and returns mov.
+    '''
+    d = (mov - orient) % 4
+    if d == 3:
+        ops.append(TURN_CCW)
+    else:
+        ops.extend([TURN_CW]*d)
+    return mov
+
+
+def compile_path(start, path, arrow=False, orient=0, goal=None, size=None):
+    '''
+    Compiles a path for an Agent at start into a MotionPlan.
+
+    args:
+        start: cell the Agent is in
+        path: {cell: next cell} dictionary, list of cells, or string of
+            N/E/S/W moves with C/A for a clockwise/anti-clockwise turn
+        arrow: the Agent is an arrow, it turns to face every move first
+        orient: orientation of the arrow (0 to 3 for N, E, S, W)
+        goal: the plan stops at this cell
+        size: (rows, cols), moves of a string that leave the Maze are
+            skipped (their turns are kept)
+
+    returns: the MotionPlan
+    '''
+    plan = MotionPlan(start)
+    ops = plan.ops
+    x, y = start
+    orient %= 4
+    if isinstance(path, str):
+        rows, cols = size if size is not None else (float('inf'),)*2
+        for c in path:
+            if c == 'C':
+                ops.append(TURN_CW)
+                orient = (orient+1) % 4
+            elif c == 'A':
+                ops.append(TURN_CCW)
+                orient = (orient-1) % 4
+            elif c in _LETTERS:
+                mov = _LETTERS[c]
+                if arrow:
+                    orient = _turns(ops, orient, mov)
+                dx, dy = MOVES[mov]
+                if 0 < x+dx <= rows and 0 < y+dy <= cols:
+                    x, y = x+dx, y+dy
+                    ops.append(mov)
+            if (x, y) == goal:
+                break
+        plan.end = (x, y)
+        return plan
+    if isinstance(path, dict):
+        cells = []
+        cell = start
+        # a dictionary with a loop in it is walked at most once round
+        while cell in path and cell != goal and len(cells) < len(path):
+            cell = path[cell]
+            cells.append(cell)
+    else:
+        cells = path
+    for cell in cells:
+        if (x, y) == tuple(cell):
+            continue
+        mov = _MOVE.get((cell[0]-x, cell[1]-y))
+        if mov is None:
+            ops.append(JUMP)
+            plan.jumps.append(tuple(cell))
+        else:
+            if arrow:
+                orient = _turns(ops, orient, mov)
+            ops.append(mov)
+        x, y = cell
+        if (x, y) == goal:
+            break
+    plan.end = (x, y)
+    return plan
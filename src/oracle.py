@@ -0,0 +1,131 @@
+'''
+Distance and path oracle for perfect mazes.
+A perfect Maze (loop_percent=0) is a spanning tree, so the only path
+between two cells goes through their lowest common ancestor (LCA) in the
+tree. With the tree rooted at the goal and a binary lifting table built
+once, distance(a, b) takes O(log n) and path(a, b) takes time
+proportional to the length of the path.
+'''
+import numpy as np
+from src.generators import tree_parents
+from src.walls import EAST, SOUTH
+
+
+class TreeOracle:
+    '''
+    parent-->   parent of every cell (flat index) in the tree rooted at the
+                goal of the Maze, the root is its own parent
+    depth-->    number of steps from every cell to the root
+    up-->       binary lifting table, up[k][i] is the 2**k-th ancestor of i
+    version-->  _walls_version of the Maze the oracle was built from
+    '''
+
+    def __init__(self, maze, root=None):
+        rows, cols = maze.rows, maze.cols
+        n = rows*cols
+        w = maze._walls
+        if int(np.count_nonzero(w & EAST)+np.count_nonzero(w & SOUTH)) != n-1:
+            raise ValueError('The oracle needs a perfect Maze (no loops)!')
+        if root is None:
+            root = maze._goal
+        self.cols = cols
+        self.version = maze._walls_version
+        r = (root[0]-1)*cols + (root[1]-1)
+        parent = np.frombuffer(tree_parents(w.tobytes(), rows, cols, r),
+                               dtype=np.int32).copy()
+        parent[r] = r
+        if np.count_nonzero(parent < 0):
+            raise ValueError('The oracle needs a connected Maze!')
+        self.parent = parent
+        self.root = r
+        # pointer jumping: every pass doubles the ancestor step, which
+        # fills the lifting table and sums up the depths in log n passes
+        depth = (parent != np.arange(n)).astype(np.int32)
+        up = [parent]
+        anc = parent
+        while (anc != r).any():
+            depth += depth[anc]
+            anc = anc[anc]
+            up.append(anc)
+        self.depth = depth
+        self.up = up
+
+    def _index(self, cell):
+        return (cell[0]-1)*self.cols + (cell[1]-1)
+
+    def _cell(self, i):
+        return (i//self.cols+1, i % self.cols+1)
+
+    def _lift(self, i, steps):
+        k = 0
+        while steps:
+            if steps & 1:
+                i = int(self.up[k][i])
+            steps >>= 1
+            k += 1
+        return i
+
+    def _lca(self, a, b):
+        depth = self.depth
+        da, db = int(depth[a]), int(depth[b])
+        if da < db:
+            a, b, da, db = b, a, db, da
+        a = self._lift(a, da-db)
+        if a == b:
+            return a
+        for k in range(len(self.up)-1, -1, -1):
+            ua, ub = int(self.up[k][a]), int(self.up[k][b])
+            if ua != ub:
+                a, b = ua, ub
+        return int(self.parent[a])
+
+    def lca(self, a, b):
+        '''
+        Lowest common ancestor of cells a and b in the tree rooted at the goal.
+        '''
+        return self._cell(self._lca(self._index(a), self._index(b)))
+
+    def distance(self, a, b):
+        '''
+        Number of steps between cells a and b.
+        '''
+        a, b = self._index(a), self._index(b)
+        c = self._lca(a, b)
+        return int(self.depth[a]+self.depth[b]-2*self.depth[c])
+
+    def path(self, a, b):
+        '''
+        Generator of the cells from a to b (both included).
+        '''
+        a, b = self._index(a), self._index(b)
+        c = self._lca(a, b)
+        parent = self.parent
+        while a != c:
+            yield self._cell(a)
+            a = int(parent[a])
+        down = []
+        while b != c:
+            down.append(b)
+            b = int(parent[b])
+        yield self._cell(c)
+        for i in reversed(down):
+            yield self._cell(i)
+
+    def forward_path(self, a, b):
+        '''
+        The path from a to b as the {cell: next cell} dictionary trace_path uses.
+        '''
+        cells = list(self.path(a, b))
+        return dict(zip(cells, cells[1:]))
+
+
+def tree_oracle(maze):
+    '''
+    The TreeOracle of the Maze, built once and cached on the Maze until
+    its walls change.
+    '''
+    oracle = getattr(maze, '_tree_oracle', None)
+    if oracle is None or oracle.version != maze._walls_version:
+        oracle = TreeOracle(maze)
+        maze._tree_oracle = oracle
+    return oracle
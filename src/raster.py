@@ -0,0 +1,312 @@
+'''
+Headless raster renderer.
+Draws a Maze, its goal, marked cells, Agents and their footprints into a
+palette indexed NumPy image with array slicing, no display needed. Uses
+the cell geometry of the Tkinter drawing (src/maze.py) and the COLOR
+themes of src/theme.py. The image can be saved as a PNG, or shown in Tk as
+a single PhotoImage instead of thousands of canvas items.
+'''
+import base64
+import struct
+import zlib
+import numpy as np
+from src.theme import COLOR
+from src.walls import closed_walls
+
+# RGB of the Tk color names used by the COLOR themes and the Agents
+TK_COLORS = {
+    'gray11': (28, 28, 28),
+    'white': (255, 255, 255),
+    'black': (0, 0, 0),
+    'dim gray': (105, 105, 105),
+    'red': (255, 0, 0),
+    'red3': (205, 0, 0),
+    'tomato': (255, 99, 71),
+    'green4': (0, 139, 0),
+    'spring green': (0, 255, 127),
+    'DeepSkyBlue4': (0, 104, 139),
+    'yellow': (255, 255, 0),
+}
+
+_STEPS = {'N': (-1, 0), 'E': (0, 1), 'S': (1, 0), 'W': (0, -1)}
+# direction of a move as the orientation of an arrow Agent
+_ORIENT = {(-1, 0): 0, (0, 1): 1, (1, 0): 2, (0, -1): 3}
+
+
+def png_bytes(index, palette, transparent=None):
+    '''
+    A palette PNG (color type 3) of a 2D uint8 index image, palette is a
+    list of (r, g, b). The palette index transparent, if given, is see
+    through.
+    '''
+    def chunk(kind, data):
+        return (struct.pack('>I', len(data)) + kind + data +
+                struct.pack('>I', zlib.crc32(kind + data)))
+    h, w = index.shape
+    # every scanline starts with filter type 0
+    raw = np.zeros((h, w+1), dtype=np.uint8)
+    raw[:, 1:] = index
+    return (b'\x89PNG\r\n\x1a\n' +
+            chunk(b'IHDR', struct.pack('>IIBBBBB', w, h, 8, 3, 0, 0, 0)) +
+            chunk(b'PLTE', bytes(c for rgb in palette for c in rgb)) +
+            (chunk(b'tRNS', b'\xff'*transparent + b'\0')
+             if transparent is not None else b'') +
+            chunk(b'IDAT', zlib.compress(raw.tobytes(), 6)) +
+            chunk(b'IEND', b''))
+
+
+def path_cells(start, path, goal=None):
+    '''
+    The cells an Agent at start walks through for a path given to
+    trace_path as a dictionary, a list of cells or a string of N/E/S/W
+    moves, start included.
+    '''
+    cells = [start]
+    if isinstance(path, dict):
+        cell = start
+        while cell in path and cell != goal and len(cells) <= len(path):
+            cell = path[cell]
+            cells.append(cell)
+    elif isinstance(path, str):
+        x, y = start
+        for move in path:
+            if move in _STEPS:
+                x, y = x+_STEPS[move][0], y+_STEPS[move][1]
+                cells.append((x, y))
+    else:
+        cells.extend(path)
+    return cells
+
+
+class Raster:
+    '''
+    image-->    (height, width) uint8 array of palette indices
+    palette-->  list of (r, g, b), index 0 is the background, 1 the walls
+    '''
+
+    def __init__(self, maze, cell_width=20, theme=None, cell_density=None, margin=None):
+        '''
+        maze-->         the Maze (or MazeModel)
+        cell_width-->   pixels per cell, can be fractional like the Tk one
+        theme-->        COLOR (or its name), default is the theme of the Maze
+        cell_density--> width of the wall lines, default is the one of the Maze
+        margin-->       space around the Maze, default is a wall width
+        '''
+        if theme is None:
+            theme = getattr(maze, 'theme', COLOR.dark)
+        elif isinstance(theme, str):
+            if theme in COLOR.__members__:
+                theme = COLOR[theme]
+            else:
+                raise ValueError(f'{theme} is not a valid theme COLOR!')
+        if cell_density is None:
+            cell_density = getattr(maze, 'cell_density', 2)
+        if margin is None:
+            margin = cell_density
+        self.maze = maze
+        self.theme = theme
+        self.cell_width = cell_width
+        self.cell_density = cell_density
+        self.margin = margin
+        self.palette = []
+        self._index = {}
+        self._color(theme.value[0])
+        self._color(theme.value[1])
+        width = round(maze.cols*cell_width + 2*margin)
+        height = round(maze.rows*cell_width + 2*margin)
+        self.image = np.zeros((height, width), dtype=np.uint8)
+
+    def _color(self, name):
+        '''
+        Palette index of a Tk color name (or an (r, g, b) tuple).
+        '''
+        if name not in self._index:
+            if len(self.palette) == 256:
+                raise ValueError('The palette is full!')
+            rgb = name if isinstance(name, tuple) else TK_COLORS.get(name)
+            if rgb is None:
+                raise ValueError(f'{name} is not a valid color!')
+            self._index[name] = len(self.palette)
+            self.palette.append(rgb)
+        return self._index[name]
+
+    def _px(self, v):
+        '''
+        Pixel coordinates of line positions (in cells) as ints.
+        '''
+        return np.rint(np.asarray(v)*self.cell_width + self.margin).astype(np.int64)
+
+    def draw_walls(self):
+        '''
+        Draws every closed wall as a cell_density thick line, all the walls
+        of one direction with one fancy indexing assignment.
+        '''
+        img = self.image
+        h_px, w_px = img.shape
+        t = self.cell_density
+        lo = t//2
+        horizontal, vertical = closed_walls(self.maze._walls)
+        n = int(np.ceil(self.cell_width)) + t
+        along = np.arange(n)
+        across = np.arange(t) - lo
+        for closed, shape in ((horizontal, (h_px, w_px)), (vertical, (w_px, h_px))):
+            line, cell = np.nonzero(closed)
+            pos = self._px(line)
+            start = self._px(cell) - lo
+            end = self._px(cell+1) - lo + t
+            # every wall is a t x n block, cut back to its own length
+            a = np.clip(start[:, None, None] + along[None, None, :], 0, shape[1]-1)
+            b = np.clip(pos[:, None, None] + across[None, :, None], 0, shape[0]-1)
+            keep = np.broadcast_to(a < end[:, None, None], (line.size, t, n))
+            a, b = np.broadcast_arrays(a, b)
+            if closed is horizontal:
+                img[b[keep], a[keep]] = 1
+            else:
+                img[a[keep], b[keep]] = 1
+        return self
+
+    def draw_cells(self, cells, color, size=1.0, offset=0.0):
+        '''
+        Fills a square in every cell at once with fancy indexing.
+        size and offset are fractions of the cell: size=1 fills the cell
+        (filled Agent), size=0.25 with offset=0.4 is the small square Agent.
+        '''
+        if len(cells) == 0:
+            return self
+        c = np.asarray(list(cells), dtype=np.int64) - 1
+        w = self.cell_width
+        top = self._px(c[:, 0] + offset)
+        left = self._px(c[:, 1] + offset)
+        n = max(int(round(size*w)), 1)
+        d = np.arange(n)
+        h, wd = self.image.shape
+        rows = np.clip(top[:, None, None] + d[None, :, None], 0, h-1)
+        cols = np.clip(left[:, None, None] + d[None, None, :], 0, wd-1)
+        self.image[rows, cols] = self._color(color)
+        return self
+
+    def draw_marked(self, cells=None):
+        '''
+        Red dots on the marked cells (mark_cells of the Maze by default),
+        like trace_path with showMarked.
+        '''
+        if cells is None:
+            cells = self.maze.mark_cells
+        if len(cells) == 0:
+            return self
+        w = self.cell_width
+        n = max(int(round(0.15*w)), 1)
+        d = np.arange(n) - (n-1)/2
+        disc = d[:, None]**2 + d[None, :]**2 <= (n/2)**2
+        dy, dx = np.nonzero(disc)
+        c = np.asarray(list(cells), dtype=np.int64) - 1
+        top = self._px(c[:, 0] + 0.45)
+        left = self._px(c[:, 1] + 0.45)
+        h, wd = self.image.shape
+        self.image[np.clip(top[:, None] + dy, 0, h-1),
+                   np.clip(left[:, None] + dx, 0, wd-1)] = self._color('red')
+        return self
+
+    def draw_agent(self, agent, cell=None, head=True):
+        '''
+        Draws an Agent at cell (its position by default), in its head color,
+        or in its footprint color if head is False.
+        '''
+        cell = (agent.x, agent.y) if cell is None else cell
+        color = agent.color.value[0 if head else 1]
+        if agent.shape == 'arrow':
+            return self._draw_arrow(cell, agent._orient % 4, color)
+        if agent.filled:
+            return self.draw_cells([cell], color)
+        return self.draw_cells([cell], color, 0.25, 0.4)
+
+    def _draw_arrow(self, cell, orient, color):
+        '''
+        A triangle pointing North, East, South or West (orient 0 to 3).
+        '''
+        n = max(int(round(0.4*self.cell_width)), 3)
+        i, j = np.mgrid[0:n, 0:n]
+        # pointing North: the tip on the top row, widening downwards
+        tri = np.abs(j - (n-1)/2) <= i/2
+        tri = np.rot90(tri, -orient)
+        dy, dx = np.nonzero(tri)
+        top = int(self._px(cell[0]-1 + 0.3))
+        left = int(self._px(cell[1]-1 + 0.3))
+        h, wd = self.image.shape
+        self.image[np.clip(top + dy, 0, h-1), np.clip(left + dx, 0, wd-1)] = self._color(color)
+        return self
+
+    def draw_path(self, agent, path):
+        '''
+        An Agent at the end of a path (any format trace_path takes), with its
+        footprints along the path if it leaves footprints.
+        '''
+        cells = path_cells((agent.x, agent.y), path, agent.goal)
+        if agent.footprints and agent.shape == 'arrow':
+            for old, new in zip(cells, cells[1:]):
+                orient = _ORIENT.get((new[0]-old[0], new[1]-old[1]), agent._orient % 4)
+                self._draw_arrow(old, orient, agent.color.value[1])
+        elif agent.footprints and agent.filled:
+            self.draw_cells(cells[:-1], agent.color.value[1])
+        elif agent.footprints:
+            self.draw_cells(cells[:-1], agent.color.value[1], 0.25, 0.4)
+        if agent.shape == 'arrow' and len(cells) > 1:
+            old, new = cells[-2], cells[-1]
+            orient = _ORIENT.get((new[0]-old[0], new[1]-old[1]), agent._orient % 4)
+            return self._draw_arrow(new, orient, agent.color.value[0])
+        return self.draw_agent(agent, cells[-1])
+
+    def rgb(self):
+        '''
+        (height, width, 3) uint8 RGB image.
+        '''
+        return np.asarray(self.palette, dtype=np.uint8)[self.image]
+
+    def png(self, transparent=False):
+        '''
+        PNG file data, with a see through background if transparent.
+        '''
+        return png_bytes(self.image, self.palette, 0 if transparent else None)
+
+    def save_png(self, filename):
+        with open(filename, 'wb') as f:
+            f.write(self.png())
+        return filename
+
+    def photo_image(self, master=None, transparent=False):
+        '''
+        The image as a Tk PhotoImage (Tk 8.6 reads PNG data).
+        '''
+        from tkinter import PhotoImage
+        return PhotoImage(master=master, format='png',
+                          data=base64.b64encode(self.png(transparent)))
+
+
+def render(maze, paths=None, cell_width=20, theme=None, show_marked=True):
+    '''
+    Raster of the Maze with its goal, the marked cells and its Agents.
+
+    args:
+        maze: the Maze (or MazeModel)
+        paths: optional {agent: path} like trace_path, the Agents are drawn
+            at the end of their paths with footprints along them
+        cell_width: pixels per cell
+        theme: COLOR, default is the theme of the Maze
+        show_marked: draw the marked cells
+
+    returns: the Raster, use save_png or rgb on it.
+    '''
+    r = Raster(maze, cell_width, theme)
+    goal = getattr(maze, '_goal', None)
+    if goal is not None:
+        r.draw_cells([goal], COLOR.green.value[0])
+    if show_marked:
+        r.draw_marked()
+    paths = paths or {}
+    for a in maze._agents:
+        if a in paths:
+            r.draw_path(a, paths[a])
+        else:
+            r.draw_agent(a)
+    # walls last so that they stay on top, like the 'wall' tag on the canvas
+    return r.draw_walls()
@@ -0,0 +1,89 @@
+'''
+Instrumentation.
+A Stats object collects the timings of the phases of create_maze (carving,
+loop injection, path, drawing) and of the solvers, and counters like the
+nodes expanded. Pass one as stats to create_maze or a_star. It is a
+dictionary of the counters, so code that passes a plain dictionary as
+stats keeps working, and with stats=None nothing is measured.
+'''
+import functools
+import inspect
+import time
+from contextlib import contextmanager, nullcontext
+
+_NOTHING = nullcontext()
+
+
+class Stats(dict):
+    '''
+    The counters by name, like {'nodes_expanded': 951578}.
+
+    timings-->  {phase: seconds}, summed if a phase runs more than once
+    callback--> optional function called as callback(phase, seconds, stats)
+                at the end of every phase, to send them on (e.g. to a
+                metrics pipeline)
+    '''
+
+    def __init__(self, callback=None):
+        super().__init__()
+        self.timings = {}
+        self.callback = callback
+
+    def count(self, name, n=1):
+        '''
+        Adds n to the counter name.
+        '''
+        self[name] = self.get(name, 0) + n
+
+    @contextmanager
+    def phase(self, name):
+        '''
+        Times the with block as phase name.
+        '''
+        start = time.perf_counter()
+        try:
+            yield self
+        finally:
+            seconds = time.perf_counter() - start
+            self.timings[name] = self.timings.get(name, 0) + seconds
+            if self.callback is not None:
+                self.callback(name, seconds, self)
+
+    def as_dict(self):
+        '''
+        {'timings': {...}, 'counters': {...}}, e.g. for json.dumps.
+        '''
+        return {'timings': dict(self.timings), 'counters': dict(self)}
+
+    def __repr__(self):
+        return f'Stats(timings={self.timings!r}, counters={dict(self)!r})'
+
+
+def phase(stats, name):
+    '''
+    stats.phase(name) for a Stats, else a context manager that does
+    nothing, so plain dictionaries and None can be passed as stats.
+    '''
+    if isinstance(stats, Stats):
+        return stats.phase(name)
+    return _NOTHING
+
+
+def timed(name):
+    '''
+    Decorator for a function with a stats argument: its calls are timed
+    as phase name when stats is a Stats, and only that check is made
+    otherwise.
+    '''
+    def decorate(fn):
+        position = list(inspect.signature(fn).parameters).index('stats')
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            stats = args[position] if len(args) > position else kwargs.get('stats')
+            if isinstance(stats, Stats):
+                with stats.phase(name):
+                    return fn(*args, **kwargs)
+            return fn(*args, **kwargs)
+        return wrapper
+    return decorate
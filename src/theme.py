@@ -1,4 +1,3 @@
-from tkinter import *
 from enum import Enum
 
 class COLOR(Enum):
@@ -0,0 +1,285 @@
+'''
+Tiled maze file.
+The wall bits (src/walls.py) of a huge Maze cut into rectangular tiles,
+each stored on its own (optionally zlib compressed) after an index of tile
+offsets. A rectangular window, or the tiles a search walks into, can be
+read without touching the rest of the file. Tiles read are kept in an LRU
+cache with a memory cap.
+'''
+import heapq
+import random
+import struct
+import zlib
+from collections import OrderedDict
+import numpy as np
+from src.walls import EAST, WEST, NORTH, SOUTH
+from src.generators import eller_rows
+
+MAGIC = b'PYMT'
+VERSION = 1
+# magic, version, header size, rows, cols, tile rows, tile cols,
+# compressed flag, goal x, goal y (0 if unknown)
+_HEADER = struct.Struct('<4sHHQQIIBQQ')
+# the index starts at a multiple of this
+_ALIGN = 64
+DEFAULT_TILE = (256, 256)
+
+
+def is_tiled_file(filename):
+    '''
+    True if the file starts with the tiled maze file magic.
+    '''
+    with open(filename, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+class TiledWriter:
+    '''
+    Writes a tiled maze file row by row, one band of tiles at a time, so
+    memory stays at tile rows x cols cells whatever the number of rows.
+    Use it as a context manager and call write_row once per row.
+    '''
+
+    def __init__(self, filename, rows, cols, tile=DEFAULT_TILE, compress=False, goal=None):
+        self.filename = filename
+        self.rows = rows
+        self.cols = cols
+        self.tile_rows, self.tile_cols = tile
+        self.compress = compress
+        self.goal = goal
+        self._written = 0
+        self._band = np.zeros((self.tile_rows, cols), dtype=np.uint8)
+        self._f = None
+
+    def __enter__(self):
+        tiles = -(-self.rows//self.tile_rows) * -(-self.cols//self.tile_cols)
+        gx, gy = self.goal if self.goal is not None else (0, 0)
+        size = _HEADER.size + -_HEADER.size % _ALIGN
+        self._f = open(self.filename, 'wb')
+        self._f.write(_HEADER.pack(MAGIC, VERSION, size, self.rows, self.cols,
+                                   self.tile_rows, self.tile_cols,
+                                   self.compress, gx, gy).ljust(size, b'\0'))
+        # the index (tiles+1 offsets) is filled in at the end
+        self._index = np.zeros(tiles+1, dtype=np.uint64)
+        self._index_offset = size
+        self._f.write(self._index.tobytes())
+        self._tile = 0
+        self._index[0] = self._f.tell()
+        return self
+
+    def write_row(self, row):
+        if len(row) != self.cols:
+            raise ValueError(f'row has {len(row)} cells, expected {self.cols}')
+        self._band[self._written % self.tile_rows] = np.frombuffer(row, dtype=np.uint8)
+        self._written += 1
+        if self._written % self.tile_rows == 0 or self._written == self.rows:
+            self._write_band((self._written-1) % self.tile_rows + 1)
+
+    def _write_band(self, height):
+        f = self._f
+        for c in range(0, self.cols, self.tile_cols):
+            data = self._band[:height, c:c+self.tile_cols].tobytes()
+            if self.compress:
+                data = zlib.compress(data)
+            f.write(data)
+            self._tile += 1
+            self._index[self._tile] = f.tell()
+
+    def __exit__(self, *exc):
+        if exc[0] is None and self._written == self.rows:
+            self._f.seek(self._index_offset)
+            self._f.write(self._index.tobytes())
+        self._f.close()
+        if exc[0] is None and self._written != self.rows:
+            raise ValueError(
+                f'{self._written} rows written, expected {self.rows}')
+
+
+def write_tiled(filename, walls, tile=DEFAULT_TILE, compress=False, goal=None):
+    '''
+    Writes a (rows, cols) wall array, a memory mapped one included, to a
+    tiled maze file.
+    '''
+    rows, cols = walls.shape
+    with TiledWriter(filename, rows, cols, tile, compress, goal) as w:
+        for r in range(rows):
+            w.write_row(walls[r])
+    return filename
+
+
+def stream_tiled_maze(filename, rows, cols, tile=DEFAULT_TILE, compress=True, pattern=None, rng=random):
+    '''
+    Generates a rows x cols Maze with Eller's algorithm straight into a
+    tiled maze file, holding only one band of tiles in memory.
+    '''
+    with TiledWriter(filename, rows, cols, tile, compress) as w:
+        for row in eller_rows(rows, cols, pattern, rng):
+            w.write_row(row)
+    return filename
+
+
+class TiledMaze:
+    '''
+    Random access to a tiled maze file.
+
+    rows, cols-->   size of the Maze
+    goal-->         goal stored in the file, None if there is none
+    cache_bytes-->  memory cap of the LRU cache of tiles
+    hits, misses--> cache statistics, misses is the number of tiles read
+    '''
+
+    def __init__(self, filename, cache_bytes=64 << 20):
+        self.filename = filename
+        self._f = open(filename, 'rb')
+        head = self._f.read(_HEADER.size)
+        if len(head) < _HEADER.size or head[:len(MAGIC)] != MAGIC:
+            self._f.close()
+            raise ValueError(f'{filename} is not a tiled maze file!')
+        (magic, version, size, self.rows, self.cols, self.tile_rows,
+         self.tile_cols, self.compressed, gx, gy) = _HEADER.unpack(head)
+        if version > VERSION:
+            self._f.close()
+            raise ValueError(f'{filename} has unsupported version {version}!')
+        self.goal = (gx, gy) if gx else None
+        self.tiles_across = -(-self.cols//self.tile_cols)
+        tiles = -(-self.rows//self.tile_rows)*self.tiles_across
+        self._f.seek(size)
+        self._index = np.frombuffer(self._f.read(8*(tiles+1)), dtype=np.uint64)
+        self.cache_bytes = cache_bytes
+        self._cache = OrderedDict()
+        self._cached_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._f.close()
+        self._cache.clear()
+        self._cached_bytes = 0
+
+    def tile(self, tr, tc):
+        '''
+        The wall array of tile (tr, tc), counted from 0, read on a miss.
+        '''
+        key = tr*self.tiles_across + tc
+        t = self._cache.get(key)
+        if t is not None:
+            self.hits += 1
+            self._cache.move_to_end(key)
+            return t
+        self.misses += 1
+        start, end = int(self._index[key]), int(self._index[key+1])
+        self._f.seek(start)
+        data = self._f.read(end-start)
+        if self.compressed:
+            data = zlib.decompress(data)
+        height = min(self.tile_rows, self.rows - tr*self.tile_rows)
+        width = min(self.tile_cols, self.cols - tc*self.tile_cols)
+        t = np.frombuffer(data, dtype=np.uint8).reshape(height, width)
+        self._cache[key] = t
+        self._cached_bytes += t.nbytes
+        while self._cached_bytes > self.cache_bytes and len(self._cache) > 1:
+            self._cached_bytes -= self._cache.popitem(last=False)[1].nbytes
+        return t
+
+    def bits(self, x, y):
+        '''
+        Wall bits of cell (x, y).
+        '''
+        tr, r = divmod(x-1, self.tile_rows)
+        tc, c = divmod(y-1, self.tile_cols)
+        return self.tile(tr, tc).item(r, c)
+
+    def window(self, x0, y0, x1, y1):
+        '''
+        (x1-x0+1, y1-y0+1) wall array of the cells from (x0, y0) to (x1, y1),
+        both included, read from the tiles it overlaps only.
+        '''
+        if not (1 <= x0 <= x1 <= self.rows and 1 <= y0 <= y1 <= self.cols):
+            raise ValueError(f'{(x0, y0, x1, y1)} is not a valid window!')
+        tr_, tc_ = self.tile_rows, self.tile_cols
+        out = np.empty((x1-x0+1, y1-y0+1), dtype=np.uint8)
+        for tr in range((x0-1)//tr_, (x1-1)//tr_ + 1):
+            r0, r1 = max(x0-1, tr*tr_), min(x1, (tr+1)*tr_)
+            for tc in range((y0-1)//tc_, (y1-1)//tc_ + 1):
+                c0, c1 = max(y0-1, tc*tc_), min(y1, (tc+1)*tc_)
+                out[r0-x0+1:r1-x0+1, c0-y0+1:c1-y0+1] = self.tile(tr, tc)[
+                    r0-tr*tr_:r1-tr*tr_, c0-tc*tc_:c1-tc*tc_]
+        return out
+
+    def load_window(self, maze, x0, y0, x1, y1):
+        '''
+        Makes the window from (x0, y0) to (x1, y1) the walls of maze (a Maze
+        or MazeModel), with the walls on its border closed. Cell (1, 1) of
+        the Maze is cell (x0, y0) of the file, maze.origin keeps (x0, y0).
+        The goal is the goal of the file if it is in the window, else (1, 1).
+        '''
+        walls = self.window(x0, y0, x1, y1)
+        walls[0, :] &= ~NORTH & 0xFF
+        walls[-1, :] &= ~SOUTH & 0xFF
+        walls[:, 0] &= ~WEST & 0xFF
+        walls[:, -1] &= ~EAST & 0xFF
+        maze._use_walls(walls)
+        maze._tree = None
+        maze.origin = (x0, y0)
+        maze._goal = (1, 1)
+        if self.goal is not None and x0 <= self.goal[0] <= x1 and y0 <= self.goal[1] <= y1:
+            maze._goal = (self.goal[0]-x0+1, self.goal[1]-y0+1)
+        return maze
+
+
+def a_star(tiled, start, goal, stats=None):
+    '''
+    A* search on a TiledMaze, paging tiles in through its cache as the
+    search reaches them. Scores are kept in dictionaries, so memory grows
+    with the cells visited, not with the size of the Maze.
+
+    It isn't src/solvers.py's a_star with a paged wall lookup because
+    that one allocates g score, parent and closed arrays of rows*cols
+    cells up front. A tiled Maze is one that doesn't fit in memory, so
+    those arrays don't either.
+
+    returns: the forward path dictionary {cell: next cell}, empty if goal
+    can't be reached.
+    '''
+    bits = tiled.bits
+    gx, gy = goal
+    g_score = {start: 0}
+    parent = {start: None}
+    closed = set()
+    heap = [(abs(start[0]-gx)+abs(start[1]-gy), 0, start)]
+    expanded = 0
+    found = False
+    while heap:
+        f, neg_g, cell = heapq.heappop(heap)
+        if cell in closed:
+            continue
+        if cell == goal:
+            found = True
+            break
+        closed.add(cell)
+        expanded += 1
+        x, y = cell
+        b = bits(x, y)
+        g = g_score[cell]+1
+        for d, nxt in ((EAST, (x, y+1)), (SOUTH, (x+1, y)),
+                       (NORTH, (x-1, y)), (WEST, (x, y-1))):
+            if b & d and nxt not in closed and g < g_score.get(nxt, g+1):
+                g_score[nxt] = g
+                parent[nxt] = cell
+                heapq.heappush(heap, (g+abs(nxt[0]-gx)+abs(nxt[1]-gy), -g, nxt))
+    if stats is not None:
+        stats['nodes_expanded'] = expanded
+    if not found:
+        return {}
+    forward_path = {}
+    cell = goal
+    while parent[cell] is not None:
+        forward_path[parent[cell]] = cell
+        cell = parent[cell]
+    return dict(reversed(forward_path.items()))
@@ -0,0 +1,209 @@
+'''
+Zoomable, pannable view of a large Maze in the Tk window.
+Canvas items keep Maze coordinates (cell (x, y) has its top left corner at
+x*w-w+lab_width, y*w-w+lab_width) and the canvas scrolls over them, so
+Agents, footprints and marked cells move with the view by themselves.
+Only the walls of the visible cells (and a margin around them) are line
+items. They are kept in a pool and moved with coords as the view moves,
+instead of being deleted and created again.
+'''
+from src.walls import wall_runs
+
+# Mazes with more rows or columns than this are drawn in a Viewport
+VIEWPORT_SIZE = 200
+# readable cell width of the Viewport, and the zoom limits
+CELL_WIDTH = 20
+MIN_WIDTH = 8
+MAX_WIDTH = 90
+
+
+class Viewport:
+    '''
+    maze-->     the drawn Maze, its _cell_width is the zoom
+    margin-->   cells drawn around the visible ones, as a fraction of the
+                view, so that small pans don't need new walls
+    items-->    number of wall line items in the pool
+    drawn-->    (x0, y0, x1, y1) cells whose walls are drawn, both included
+    '''
+
+    def __init__(self, maze, margin=0.25):
+        self.maze = maze
+        self.margin = margin
+        self.drawn = None
+        self._pool = []
+        self._used = 0
+
+    @property
+    def items(self):
+        return len(self._pool)
+
+    def _size(self):
+        '''
+        Width and height of the canvas on screen, in pixels.
+        '''
+        c = self.maze._canvas
+        width, height = c.winfo_width(), c.winfo_height()
+        if width <= 1 or height <= 1:
+            # not mapped yet, the size it was asked for
+            width, height = int(c.cget('width')), int(c.cget('height'))
+        return width, height
+
+    def _scroll_region(self):
+        m = self.maze
+        w, lab = m._cell_width, m._lab_width
+        m._canvas.configure(scrollregion=(
+            0, 0, m.cols*w + 2*lab, m.rows*w + 2*lab))
+
+    def visible(self, margin=0):
+        '''
+        (x0, y0, x1, y1) cells in view, both included, grown by margin
+        times the view on every side.
+        '''
+        m = self.maze
+        c = m._canvas
+        w, lab = m._cell_width, m._lab_width
+        width, height = self._size()
+        left, top = c.canvasx(0), c.canvasy(0)
+        dx, dy = width*margin, height*margin
+        x0 = int((top - dy - lab)//w) + 1
+        x1 = int((top + height + dy - lab)//w) + 1
+        y0 = int((left - dx - lab)//w) + 1
+        y1 = int((left + width + dx - lab)//w) + 1
+        return (max(x0, 1), max(y0, 1), min(x1, m.rows), min(y1, m.cols))
+
+    def refresh(self, force=False):
+        '''
+        Draws the walls around the view if the view left the drawn cells.
+        '''
+        x0, y0, x1, y1 = self.visible()
+        d = self.drawn
+        if not force and d is not None and (
+                d[0] <= x0 and d[1] <= y0 and x1 <= d[2] and y1 <= d[3]):
+            return
+        self.drawn = self.visible(self.margin)
+        self._draw_walls(*self.drawn)
+
+    def _draw_walls(self, x0, y0, x1, y1):
+        m = self.maze
+        c = m._canvas
+        w, lab = m._cell_width, m._lab_width
+        self._used = 0
+        if x0 <= x1 and y0 <= y1:
+            h, v = wall_runs(m._walls[x0-1:x1, y0-1:y1])
+            # walls on the border of the window come from the cells inside it
+            top, left = (x0-1)*w + lab, (y0-1)*w + lab
+            for r, c0, c1 in h:
+                self._line(left + c0*w, top + r*w, left + c1*w, top + r*w)
+            for col, r0, r1 in v:
+                self._line(left + col*w, top + r0*w, left + col*w, top + r1*w)
+        for item in self._pool[self._used:]:
+            c.itemconfigure(item, state='hidden')
+        c.tag_raise('wall')
+
+    def _line(self, *coords):
+        c = self.maze._canvas
+        if self._used < len(self._pool):
+            item = self._pool[self._used]
+            c.coords(item, *coords)
+            c.itemconfigure(item, state='normal')
+        else:
+            item = c.create_line(*coords, width=self.maze.cell_density,
+                                 fill=self.maze.theme.value[1], tag='wall')
+            self._pool.append(item)
+        self._used += 1
+
+    def zoom(self, factor, sx=None, sy=None):
+        '''
+        Zooms by factor, keeping the point (sx, sy) of the canvas (its
+        middle by default) in place. The cell width stays within
+        MIN_WIDTH and MAX_WIDTH.
+        '''
+        m = self.maze
+        c = m._canvas
+        w, lab = m._cell_width, m._lab_width
+        new_w = min(max(w*factor, MIN_WIDTH), MAX_WIDTH)
+        if new_w == w:
+            return
+        f = new_w/w
+        width, height = self._size()
+        sx = width/2 if sx is None else sx
+        sy = height/2 if sy is None else sy
+        wx, wy = c.canvasx(sx), c.canvasy(sy)
+        # cells keep their top left corner at x*w-w+lab after the zoom
+        c.scale('all', lab, lab, f, f)
+        m._cell_width = new_w
+        for a in m._agents:
+            if hasattr(a, '_head'):
+                a._resize()
+        self._scroll_region()
+        self._scroll((wx - lab)*(f - 1), (wy - lab)*(f - 1))
+        self.refresh(force=True)
+
+    def _scroll(self, dx, dy):
+        '''
+        Moves the view dx, dy pixels to the right and down.
+        '''
+        c = self.maze._canvas
+        c.scan_mark(0, 0)
+        c.scan_dragto(-round(dx), -round(dy), gain=1)
+
+    def pan(self, dx, dy):
+        '''
+        Moves the view dx, dy pixels to the right and down.
+        '''
+        self._scroll(dx, dy)
+        self.refresh()
+
+    def show(self, x, y):
+        '''
+        Centers the view on cell (x, y).
+        '''
+        m = self.maze
+        c = m._canvas
+        w, lab = m._cell_width, m._lab_width
+        width, height = self._size()
+        self._scroll((y-0.5)*w + lab - c.canvasx(width/2),
+                     (x-0.5)*w + lab - c.canvasy(height/2))
+        self.refresh()
+
+    def bind(self):
+        '''
+        Drag with the mouse to pan, mouse wheel or +/- keys to zoom.
+        '''
+        c = self.maze._canvas
+        win = self.maze._win
+
+        def press(event):
+            c.scan_mark(event.x, event.y)
+
+        def drag(event):
+            c.scan_dragto(event.x, event.y, gain=1)
+            self.refresh()
+
+        def wheel(event):
+            up = event.num == 4 or getattr(event, 'delta', 0) > 0
+            self.zoom(1.25 if up else 0.8, event.x, event.y)
+
+        c.bind('<ButtonPress-1>', press)
+        c.bind('<B1-Motion>', drag)
+        c.bind('<MouseWheel>', wheel)
+        c.bind('<Button-4>', wheel)
+        c.bind('<Button-5>', wheel)
+        c.bind('<Configure>', lambda event: self.refresh())
+        win.bind('<plus>', lambda event: self.zoom(1.25))
+        win.bind('<equal>', lambda event: self.zoom(1.25))
+        win.bind('<minus>', lambda event: self.zoom(0.8))
+
+
+def draw_viewport(maze, cell_width=CELL_WIDTH):
+    '''
+    Sets up the Viewport of a Maze whose canvas was just created, and
+    draws the walls in view. Returns the Viewport.
+    '''
+    maze._cell_width = cell_width
+    view = Viewport(maze)
+    view._scroll_region()
+    # start at the goal, where the Agents are headed
+    view.show(*maze._goal)
+    view.bind()
+    return view
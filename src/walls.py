@@ -0,0 +1,175 @@
+'''
+Wall store of a Maze.
+Every cell is one byte of E/W/N/S bit flags in a (rows, cols) NumPy array.
+MazeMapView and CellView give the old maze_map dictionary view over it,
+and wall_runs merges the closed walls into straight runs for drawing.
+'''
+from collections.abc import Mapping, Sequence
+import numpy as np
+
+# Bit flags of a cell in the wall array. A set bit means that direction is open.
+EAST = 1
+WEST = 2
+NORTH = 4
+SOUTH = 8
+DIRECTIONS = {'E': EAST, 'W': WEST, 'N': NORTH, 'S': SOUTH}
+
+
+def new_walls(rows, cols):
+    '''
+    A (rows, cols) uint8 array with every wall closed.
+    Cell (x, y) of the Maze is stored at [x-1, y-1].
+    '''
+    return np.zeros((rows, cols), dtype=np.uint8)
+
+
+class CellView(Mapping):
+    '''
+    Read-only view of the walls of one cell.
+    Behaves like the old {'E':0/1,'W':0/1,'N':0/1,'S':0/1} dictionary.
+    '''
+
+    __slots__ = ('_bits',)
+
+    def __init__(self, bits):
+        self._bits = bits
+
+    def __getitem__(self, d):
+        return 1 if self._bits & DIRECTIONS[d] else 0
+
+    def __iter__(self):
+        return iter(DIRECTIONS)
+
+    def __len__(self):
+        return 4
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+class MazeMapView(Mapping):
+    '''
+    Read-only view of the wall array keyed by cell (x, y).
+    Cells are iterated column by column, in the same order as Maze.grid
+    '''
+
+    __slots__ = ('_walls',)
+
+    def __init__(self, walls):
+        self._walls = walls
+
+    def __getitem__(self, cell):
+        x, y = cell
+        rows, cols = self._walls.shape
+        if not (0 < x <= rows and 0 < y <= cols):
+            raise KeyError(cell)
+        return CellView(self._walls.item(x-1, y-1))
+
+    def __contains__(self, cell):
+        try:
+            x, y = cell
+        except (TypeError, ValueError):
+            return False
+        rows, cols = self._walls.shape
+        return 0 < x <= rows and 0 < y <= cols
+
+    def __iter__(self):
+        return iter(CellGrid(*self._walls.shape))
+
+    def __len__(self):
+        return self._walls.size
+
+    def __repr__(self):
+        return '{' + ', '.join(f'{k!r}: {v!r}' for k, v in self.items()) + '}'
+
+
+class CellGrid(Sequence):
+    '''
+    All the cells of a rows x cols Maze, column by column:
+    (1,1),(2,1),...,(rows,1),(1,2),...
+    Membership test is a bounds check instead of a list scan.
+    '''
+
+    __slots__ = ('rows', 'cols')
+
+    def __init__(self, rows, cols):
+        self.rows = rows
+        self.cols = cols
+
+    def __len__(self):
+        return self.rows*self.cols
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError('cell index out of range')
+        return (i % self.rows+1, i//self.rows+1)
+
+    def __iter__(self):
+        for y in range(1, self.cols+1):
+            for x in range(1, self.rows+1):
+                yield (x, y)
+
+    def __contains__(self, cell):
+        try:
+            x, y = cell
+        except (TypeError, ValueError):
+            return False
+        return 0 < x <= self.rows and 0 < y <= self.cols
+
+    def __eq__(self, other):
+        if isinstance(other, CellGrid):
+            return (self.rows, self.cols) == (other.rows, other.cols)
+        return list(self) == other
+
+    def __repr__(self):
+        return f'CellGrid({self.rows}, {self.cols})'
+
+
+def _runs(closed):
+    '''
+    (line, start, end) of every run of True along the rows of a 2D bool
+    array, end excluded.
+    '''
+    lines, length = closed.shape
+    padded = np.zeros((lines, length+2), dtype=np.int8)
+    padded[:, 1:-1] = closed
+    edges = np.diff(padded, axis=1)
+    line, start = np.nonzero(edges == 1)
+    end = np.nonzero(edges == -1)[1]
+    return zip(line.tolist(), start.tolist(), end.tolist())
+
+
+def closed_walls(walls):
+    '''
+    The closed walls of a (rows, cols) wall array, each wall between two
+    cells counted once (closed if either side has it closed).
+    Returns (horizontal, vertical) bool arrays: horizontal[r, c] is the wall
+    above cell [r, c] (r == rows is the bottom edge), vertical[c, r] the
+    wall left of cell [r, c] (c == cols is the right edge).
+    '''
+    rows, cols = walls.shape
+    h = np.empty((rows+1, cols), dtype=bool)
+    h[0] = (walls[0] & NORTH) == 0
+    h[1:-1] = ((walls[:-1] & SOUTH) == 0) | ((walls[1:] & NORTH) == 0)
+    h[-1] = (walls[-1] & SOUTH) == 0
+    v = np.empty((cols+1, rows), dtype=bool)
+    v[0] = (walls[:, 0] & WEST) == 0
+    v[1:-1] = (((walls[:, :-1] & EAST) == 0) | ((walls[:, 1:] & WEST) == 0)).T
+    v[-1] = (walls[:, -1] & EAST) == 0
+    return h, v
+
+
+def wall_runs(walls):
+    '''
+    The closed walls (see closed_walls) merged into straight runs.
+    Returns (horizontal, vertical): horizontal runs (r, c0, c1) lie on the
+    line above row r (0 based, r == rows is the bottom edge) from column c0
+    to c1, vertical runs (c, r0, r1) lie on the line left of column c from
+    row r0 to r1, ends excluded.
+    '''
+    h, v = closed_walls(walls)
+    return _runs(h), _runs(v)